@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import threading
+import time
+from django.conf import settings
+
+# Priority classes, lowest value is served first.
+INTERACTIVE = 0
+SUMMARY = 1
+EMBEDDING = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SUMMARY: "summary", EMBEDDING: "embedding"}
+
+DEFAULT_RATE_LIMITS = {
+    "openai": {"rpm": 3500, "tpm": 90000},
+    "lm_studio": {"rpm": 600, "tpm": 1000000},
+}
+DEFAULT_MAX_QUEUE = {INTERACTIVE: 100, SUMMARY: 50, EMBEDDING: 200}
+DEFAULT_DEADLINES = {INTERACTIVE: 30.0, SUMMARY: 120.0, EMBEDDING: 60.0}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed because its queue is full or its deadline passed."""
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute, capped at one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, reserve, now):
+        """Seconds until ``amount`` can be taken while leaving ``reserve`` behind."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        needed = amount + reserve * self.capacity - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Charge (or refund, if negative) ``amount`` after the fact; may leave the bucket in debt."""
+        self.level = min(self.capacity, self.level - amount)
+
+
+class AdmissionScheduler:
+    """
+    Process-wide gate in front of LLM provider calls.
+
+    Each provider has request and token buckets. Waiting calls are served in
+    priority order; background classes may not dip into the share of the
+    buckets reserved for interactive traffic. Queues are bounded and callers
+    are shed once their deadline passes.
+    """
+
+    def __init__(self, rate_limits=None, max_queue=None, deadlines=None, background_reserve=0.2):
+        self.rate_limits = rate_limits or DEFAULT_RATE_LIMITS
+        self.max_queue = max_queue or DEFAULT_MAX_QUEUE
+        self.deadlines = deadlines or DEFAULT_DEADLINES
+        self.background_reserve = background_reserve
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._buckets = {}
+        self._queues = {}
+        self._stats = {}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            rate_limits=getattr(settings, "AI_RATE_LIMITS", None),
+            background_reserve=getattr(settings, "AI_INTERACTIVE_RESERVE", 0.2),
+        )
+
+    def _provider(self, provider):
+        if provider not in self._queues:
+            limits = self.rate_limits.get(provider) or DEFAULT_RATE_LIMITS["lm_studio"]
+            self._buckets[provider] = (TokenBucket(limits["rpm"]), TokenBucket(limits["tpm"]))
+            self._queues[provider] = []
+            self._stats[provider] = {
+                name: {"queued": 0, "admitted": 0, "shed": 0} for name in PRIORITY_NAMES.values()
+            }
+        return self._queues[provider], self._buckets[provider], self._stats[provider]
+
+    def _reserve(self, priority):
+        return 0.0 if priority == INTERACTIVE else self.background_reserve
+
+    def max_tokens(self, provider, priority):
+        """Largest token estimate a single call of ``priority`` can ever be admitted with."""
+        with self._cond:
+            _, (_, tokens_bucket), _ = self._provider(provider)
+            return int(tokens_bucket.capacity * (1 - self._reserve(priority)))
+
+    def admit(self, provider, priority, tokens=1, deadline=None):
+        """
+        Block until the call may proceed. Raises ``AdmissionRejected`` if the
+        priority's queue is full or the deadline (seconds) elapses first.
+        """
+        deadline = time.monotonic() + (deadline or self.deadlines[priority])
+        name = PRIORITY_NAMES[priority]
+        reserve = self._reserve(priority)
+
+        with self._cond:
+            queue, (requests_bucket, tokens_bucket), stats = self._provider(provider)
+            if stats[name]["queued"] >= self.max_queue[priority]:
+                stats[name]["shed"] += 1
+                raise AdmissionRejected(f"{name} queue for {provider} is full")
+            # Background calls can never fit into the reserved share; fail now
+            # instead of blocking the queue head until the deadline.
+            if reserve and tokens > tokens_bucket.capacity * (1 - reserve):
+                stats[name]["shed"] += 1
+                raise AdmissionRejected(
+                    f"{name} call to {provider} needs {tokens} tokens, more than its share of the limit"
+                )
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(queue, entry)
+            stats[name]["queued"] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    wait = remaining
+                    if queue[0] is entry:
+                        wait = max(
+                            requests_bucket.wait_time(1, reserve, now),
+                            tokens_bucket.wait_time(tokens, reserve, now),
+                        )
+                        if wait == 0:
+                            requests_bucket.take(1)
+                            tokens_bucket.take(tokens)
+                            stats[name]["admitted"] += 1
+                            return
+                    if remaining <= 0:
+                        stats[name]["shed"] += 1
+                        raise AdmissionRejected(f"{name} call to {provider} missed its deadline")
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                stats[name]["queued"] -= 1
+                self._cond.notify_all()
+
+    def charge(self, provider, tokens):
+        """
+        Settle a call's token cost once the provider reports usage. ``tokens``
+        is the actual total minus what ``admit`` already took, so completion
+        tokens count against the limit and over-estimates are refunded.
+        """
+        with self._cond:
+            _, (_, tokens_bucket), _ = self._provider(provider)
+            tokens_bucket.adjust(tokens)
+            if tokens < 0:
+                self._cond.notify_all()
+
+    def metrics(self):
+        """Queue depth and admitted/shed counters per provider and priority."""
+        with self._cond:
+            return {
+                provider: {name: dict(counters) for name, counters in stats.items()}
+                for provider, stats in self._stats.items()
+            }
+
+
+scheduler = AdmissionScheduler.from_settings()
@@ -1,10 +1,111 @@
 import os
 import json
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
 import numpy as np
 from django.conf import settings
 from openai import OpenAI
-from .models import Conversation, Message
+from .models import Conversation
+from .history import get_history
+from .admission import scheduler, estimate_tokens, AdmissionRejected, INTERACTIVE, SUMMARY, EMBEDDING
+
+
+class FallbackEmbedding(list):
+    """Hash-based vector used when no provider could embed a text; never persist it."""
+
+
+class EmbeddingDispatcher:
+    """
+    Single-flight + micro-batching front for an embedding provider.
+
+    Identical texts already queued or in flight share one Future. Requests
+    arriving within ``window_ms`` of each other are sent as one batch, capped
+    by the provider's input count and by a token budget the admission
+    scheduler can actually grant.
+    """
+
+    def __init__(self, embed_batch, window_ms=5, max_batch_size=2048,
+                 max_batch_tokens=250_000, max_concurrent_batches=4, timeout=120):
+        self._embed_batch = embed_batch
+        self.timeout = timeout
+        self._window = window_ms / 1000.0
+        self._max_batch_size = max_batch_size
+        self._max_batch_tokens = max_batch_tokens
+        self._cond = threading.Condition()
+        self._pending = {}    # text -> Future, waiting for the next batch
+        self._in_flight = {}  # text -> Future, batch already sent
+        self._collector = None
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches, thread_name_prefix="embedding-batch"
+        )
+
+    def submit(self, text):
+        """Queue ``text`` and return a Future resolving to its raw vector."""
+        with self._cond:
+            fut = self._pending.get(text) or self._in_flight.get(text)
+            if fut is None:
+                fut = Future()
+                self._pending[text] = fut
+                self._ensure_collector()
+                self._cond.notify()
+            return fut
+
+    def embed(self, text, timeout=None):
+        """Blocking embed; waits at most ``timeout`` (default ``self.timeout``) seconds."""
+        return self.submit(text).result(timeout or self.timeout)
+
+    def _ensure_collector(self):
+        if self._collector is None or not self._collector.is_alive():
+            self._collector = threading.Thread(
+                target=self._collect, name="embedding-dispatcher", daemon=True
+            )
+            self._collector.start()
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Give concurrent callers a moment to join this batch.
+            time.sleep(self._window)
+            with self._cond:
+                batch = self._take_batch()
+            self._pool.submit(self._dispatch, batch)
+
+    def _take_batch(self):
+        batch, tokens = {}, 0
+        for text in list(self._pending):
+            cost = estimate_tokens(text)
+            if batch and (len(batch) >= self._max_batch_size
+                          or tokens + cost > self._max_batch_tokens):
+                break
+            batch[text] = self._pending.pop(text)
+            tokens += cost
+        self._in_flight.update(batch)
+        return batch
+
+    def _dispatch(self, batch):
+        texts = list(batch)
+        try:
+            vectors = self._embed_batch(texts)
+            if vectors is None or len(vectors) != len(texts):
+                raise ValueError(
+                    f"Embedding provider returned {0 if vectors is None else len(vectors)} "
+                    f"vectors for {len(texts)} inputs"
+                )
+            for fut, vector in zip(batch.values(), vectors):
+                fut.set_result(vector)
+        except Exception as e:
+            # Never leave a caller waiting on a Future nobody will resolve.
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            with self._cond:
+                for text in texts:
+                    self._in_flight.pop(text, None)
 
 
 class AIService:
@@ -34,35 +135,86 @@ class AIService:
         else:
             print(" No OpenAI key found — using LM Studio (local model).")
 
+        self.embeddings = EmbeddingDispatcher(
+            self._embed_batch,
+            window_ms=getattr(settings, "EMBEDDING_BATCH_WINDOW_MS", 5),
+            max_batch_size=getattr(settings, "EMBEDDING_MAX_BATCH_SIZE", 2048),
+            max_batch_tokens=min(
+                scheduler.max_tokens("openai", EMBEDDING),
+                scheduler.max_tokens("lm_studio", EMBEDDING),
+            ),
+            timeout=getattr(settings, "EMBEDDING_TIMEOUT", 120),
+        )
+
     # ----------------------------------------------------------------------
     # CHAT WITH CONTEXT
     # ----------------------------------------------------------------------
     def chat_with_context(self, conversation, user_message):
-        """Send user message with prior context, get AI reply."""
-        history = Message.objects.filter(conversation=conversation).order_by("created_at")
-        messages = [{"role": msg.sender, "content": msg.content} for msg in history]
+        """Send user message with prior context; returns ``{"content", "usage"}``."""
+        history = get_history(conversation.id)["messages"]
+        messages = [{"role": msg["sender"], "content": msg["content"]} for msg in history]
         messages.append({"role": "user", "content": user_message})
         messages.insert(0, {"role": "system", "content": "You are a helpful, concise AI assistant."})
 
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+
         if self.use_openai and self.client:
             try:
+                scheduler.admit("openai", INTERACTIVE, tokens=prompt_tokens)
                 response = self.client.chat.completions.create(
                     model="gpt-3.5-turbo",
                     messages=messages,
                 )
-                return response.choices[0].message.content.strip()
+                reply = response.choices[0].message.content.strip()
+                usage = self._usage("gpt-3.5-turbo", response.usage, messages, reply)
+                self._settle("openai", prompt_tokens, usage)
+                return {"content": reply, "usage": usage}
+            except AdmissionRejected:
+                raise  # shed locally; another provider would only add load
             except Exception as e:
                 print(f" OpenAI request failed: {e}")
                 print("Falling back to LM Studio...")
 
-        return self._use_lm_studio(messages)
+        reply, usage = self._use_lm_studio(messages, INTERACTIVE)
+        return {"content": reply, "usage": usage}
+
+    # ----------------------------------------------------------------------
+    # TOKEN USAGE
+    # ----------------------------------------------------------------------
+    def _usage(self, model, usage, messages, reply):
+        """Provider-reported token usage, or a local estimate when it is missing."""
+        if isinstance(usage, dict):
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt_tokens = getattr(usage, "prompt_tokens", None)
+            completion_tokens = getattr(usage, "completion_tokens", None)
+
+        if prompt_tokens is None or completion_tokens is None:
+            return {
+                "model": model,
+                "prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages),
+                "completion_tokens": estimate_tokens(reply),
+                "estimated": True,
+            }
+        return {
+            "model": model,
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "estimated": False,
+        }
+
+    def _settle(self, provider, admitted_tokens, usage):
+        """Charge the scheduler for tokens used beyond the prompt estimate it admitted."""
+        scheduler.charge(provider, usage["prompt_tokens"] + usage["completion_tokens"] - admitted_tokens)
 
     # ----------------------------------------------------------------------
     # LM STUDIO FALLBACK
     # ----------------------------------------------------------------------
-    def _use_lm_studio(self, messages):
-        """Send messages to LM Studio local API."""
+    def _use_lm_studio(self, messages, priority=INTERACTIVE):
+        """Send messages to LM Studio local API; returns ``(reply, usage)``."""
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
         try:
+            scheduler.admit("lm_studio", priority, tokens=prompt_tokens)
             response = requests.post(
                 self.lm_studio_url,
                 json={
@@ -74,24 +226,29 @@ class AIService:
             )
             if response.status_code != 200:
                 print(f" LM Studio error ({response.status_code}): {response.text}")
-                return "Local AI model returned an error."
+                return "Local AI model returned an error.", None
 
             data = response.json()
             if "choices" in data and len(data["choices"]) > 0:
-                return data["choices"][0]["message"]["content"].strip()
+                reply = data["choices"][0]["message"]["content"].strip()
+                usage = self._usage("local-model", data.get("usage"), messages, reply)
+                self._settle("lm_studio", prompt_tokens, usage)
+                return reply, usage
 
-            return "Local AI model did not return a valid response."
+            return "Local AI model did not return a valid response.", None
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f" LM Studio failed: {e}")
-            return "AI service is temporarily unavailable. Please try again later."
+            return "AI service is temporarily unavailable. Please try again later.", None
 
     # ----------------------------------------------------------------------
     # SUMMARIZATION
     # ----------------------------------------------------------------------
     def summarize_conversation(self, conversation):
         """Generate a short summary + sentiment + keywords."""
-        messages = Message.objects.filter(conversation=conversation).order_by("created_at")
-        text = "\n".join([f"{m.sender}: {m.content}" for m in messages])
+        messages = get_history(conversation.id)["messages"]
+        text = "\n".join([f"{m['sender']}: {m['content']}" for m in messages])
 
         prompt = (
             f"Summarize this conversation briefly. "
@@ -100,24 +257,32 @@ class AIService:
 
         if self.use_openai and self.client:
             try:
+                prompt_tokens = estimate_tokens(prompt)
+                scheduler.admit("openai", SUMMARY, tokens=prompt_tokens)
                 response = self.client.chat.completions.create(
                     model="gpt-3.5-turbo",
                     messages=[{"role": "user", "content": prompt}],
                 )
                 summary = response.choices[0].message.content.strip()
+                usage = self._usage("gpt-3.5-turbo", response.usage, [{"content": prompt}], summary)
+                self._settle("openai", prompt_tokens, usage)
                 return {
                     "summary": summary,
                     "sentiment": "neutral",
                     "keywords": [],
+                    "usage": usage,
                 }
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 print(f"OpenAI summary failed: {e}")
 
-        summary = self._use_lm_studio([{"role": "user", "content": prompt}])
+        summary, usage = self._use_lm_studio([{"role": "user", "content": prompt}], SUMMARY)
         return {
             "summary": summary,
             "sentiment": "neutral",
             "keywords": [],
+            "usage": usage,
         }
 
     # ----------------------------------------------------------------------
@@ -127,16 +292,44 @@ class AIService:
         """Get semantic embedding using OpenAI, LM Studio, or fallback."""
         if not text.strip():
             return np.zeros(dim).tolist()
+        return self._normalize_vector(self.embeddings.embed(text), dim)
+
+    def embed_for_storage(self, texts, dim=128):
+        """
+        Provider embeddings for ``texts`` (resized to ``dim``, or raw if it is
+        ``None``), submitted together so the dispatcher batches them. Entries
+        are ``None`` where the call failed or only the hash fallback was
+        available, so callers never save those.
+        """
+        futures = [self.embeddings.submit(text) for text in texts]
+        vectors = []
+        for fut in futures:
+            try:
+                vec = fut.result(self.embeddings.timeout)
+            except Exception as e:
+                print(f" Embedding for storage failed: {e}")
+                vec = None
+            if vec is None or isinstance(vec, FallbackEmbedding):
+                vectors.append(None)
+            else:
+                vectors.append([float(x) for x in (vec if dim is None else self._normalize_vector(vec, dim))])
+        return vectors
+
+    def _embed_batch(self, texts):
+        """Embed a batch of texts in one provider call (used by the dispatcher)."""
+        batch_tokens = sum(estimate_tokens(t) for t in texts)
 
         # Try OpenAI embeddings
         if self.use_openai and self.client:
             try:
+                scheduler.admit("openai", EMBEDDING, tokens=batch_tokens)
                 emb = self.client.embeddings.create(
                     model="text-embedding-3-small",
-                    input=text
+                    input=texts
                 )
-                vec = np.array(emb.data[0].embedding)
-                return self._normalize_vector(vec, dim)
+                return [item.embedding for item in sorted(emb.data, key=lambda d: d.index)]
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 err_str = str(e)
                 if "insufficient_quota" in err_str or "429" in err_str:
@@ -146,27 +339,32 @@ class AIService:
 
         # Try LM Studio embeddings
         try:
+            scheduler.admit("lm_studio", EMBEDDING, tokens=batch_tokens)
             emb_url = f"{self.lm_studio_url.replace('/chat/completions', '')}/embeddings"
             response = requests.post(
                 emb_url,
-                json={"model": "local-embedding-model", "input": text},
+                json={"model": "local-embedding-model", "input": texts},
                 timeout=10,
             )
             if response.status_code == 200:
                 data = response.json()
-                if "data" in data and len(data["data"]) > 0:
-                    vec = np.array(data["data"][0]["embedding"])
-                    return self._normalize_vector(vec, dim)
+                if len(data.get("data", [])) == len(texts):
+                    items = sorted(data["data"], key=lambda d: d.get("index", 0))
+                    return [item["embedding"] for item in items]
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f" LM Studio embedding fallback failed: {e}")
 
         # Final fallback: simple numeric embedding (fixed length)
         print(" Using hash-based embedding fallback.")
+        return [FallbackEmbedding(self._hash_embedding(text)) for text in texts]
+
+    def _hash_embedding(self, text: str, dim: int = 128):
+        """Character-code embedding used when no provider is reachable."""
         arr = np.array([float(ord(c)) / 1000.0 for c in text[:dim]])
         if len(arr) < dim:
             arr = np.pad(arr, (0, dim - len(arr)))
-        elif len(arr) > dim:
-            arr = arr[:dim]
         return arr.tolist()
 
     def _normalize_vector(self, vec, dim: int = 128):
@@ -184,12 +382,19 @@ class AIService:
         if len(query_emb) == 0:
             return []
 
-        scored = []
-        for convo in Conversation.objects.all():
-            if not convo.ai_summary:
-                continue
+        convos = [
+            c for c in Conversation.objects.exclude(ai_summary__isnull=True).exclude(ai_summary="")
+            if c.ai_summary.strip()
+        ]
+        # Stored summary embeddings are reused; the rest go out as one batch.
+        futures = {c.id: self.embeddings.submit(c.ai_summary) for c in convos if not c.summary_embedding}
 
-            convo_emb = np.array(self._get_embedding(convo.ai_summary))
+        scored = []
+        for convo in convos:
+            if convo.summary_embedding:
+                convo_emb = self._normalize_vector(convo.summary_embedding, len(query_emb))
+            else:
+                convo_emb = self._normalize_vector(futures[convo.id].result(self.embeddings.timeout), len(query_emb))
             if len(convo_emb) == 0:
                 continue
 
@@ -219,3 +424,16 @@ class AIService:
             min_len = min(len(a), len(b))
             a, b = a[:min_len], b[:min_len]
         return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ai_service():
+    """Process-wide ``AIService``, so views, signals and commands share one embedding dispatcher."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AIService()
+        return _service
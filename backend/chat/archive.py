@@ -0,0 +1,115 @@
+"""
+Cold storage for messages of long-ended conversations.
+
+Archived conversations keep their ``Conversation`` row; their messages are
+written to a gzip-compressed NDJSON file and removed from ``chat_message``.
+They are restored on demand the next time the conversation is opened.
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Conversation, Message
+from . import history
+
+
+def archive_dir():
+    return Path(getattr(settings, "MESSAGE_ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+
+
+def archive_path(conversation_id):
+    return archive_dir() / f"conversation-{conversation_id}.ndjson.gz"
+
+
+class ArchiveUnavailable(Exception):
+    """Raised when an archived conversation's messages cannot be restored."""
+
+
+def archive_conversation(convo):
+    """
+    Move a conversation's messages to its archive file. Returns the message count.
+
+    The conversation row stays locked while the file is written, so a
+    concurrent restore or send waits, and only the messages that made it into
+    the file are deleted.
+    """
+    path = archive_path(convo.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+
+    with transaction.atomic():
+        locked = Conversation.objects.select_for_update().filter(
+            id=convo.id, status="ended", archived_at__isnull=True
+        ).first()
+        if locked is None:
+            return 0
+
+        messages = Message.objects.filter(conversation=convo).order_by("created_at", "id")
+        written = []
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            for m in messages.iterator():
+                fh.write(json.dumps({
+                    "id": m.id,
+                    "sender": m.sender,
+                    "content": m.content,
+                    "created_at": m.created_at.isoformat(),
+                    "embedding": m.embedding,
+                    "prompt_tokens": m.prompt_tokens,
+                    "completion_tokens": m.completion_tokens,
+                }) + "\n")
+                written.append(m.id)
+        os.replace(tmp_path, path)
+
+        for i in range(0, len(written), 500):
+            Message.objects.filter(conversation=convo, id__in=written[i:i + 500]).delete()
+        Conversation.objects.filter(id=convo.id).update(archived_at=timezone.now())
+    return len(written)
+
+
+def ensure_hot(convo):
+    """
+    Restore an archived conversation's messages into ``chat_message``.
+    Raises ``ArchiveUnavailable`` (leaving the conversation archived) if the
+    archive file is missing.
+    """
+    if convo.archived_at is None:
+        return convo
+
+    path = archive_path(convo.id)
+    with transaction.atomic():
+        locked = Conversation.objects.select_for_update().get(id=convo.id)
+        if locked.archived_at is not None:
+            if not path.exists():
+                print(f" Archive file missing for conversation {convo.id}: {path}")
+                raise ArchiveUnavailable(f"Archived messages of conversation {convo.id} are unavailable.")
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                rows = [json.loads(line) for line in fh if line.strip()]
+            Message.objects.bulk_create([
+                Message(
+                    id=row["id"],
+                    conversation_id=convo.id,
+                    sender=row["sender"],
+                    content=row["content"],
+                    created_at=parse_datetime(row["created_at"]),
+                    embedding=row.get("embedding"),
+                    prompt_tokens=row.get("prompt_tokens", 0),
+                    completion_tokens=row.get("completion_tokens", 0),
+                )
+                for row in rows
+            ], batch_size=500)
+            Conversation.objects.filter(id=convo.id).update(archived_at=None)
+
+    # Drop the file only after the restore committed, under the row lock and
+    # only if the conversation is still hot: archive_conversation writes its
+    # file under the same lock, so a re-archive in between keeps its file.
+    with transaction.atomic():
+        if Conversation.objects.select_for_update().filter(id=convo.id, archived_at__isnull=True).exists():
+            path.unlink(missing_ok=True)
+
+    history.invalidate(convo.id)
+    convo.archived_at = None
+    return convo
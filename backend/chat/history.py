@@ -0,0 +1,92 @@
+"""
+Read-through cache of serialized message history per conversation.
+
+Each conversation has a version counter; the serialized history for a
+version is stored under its own key and never modified in place. A new
+message bumps the version and stores the previous history plus the rows
+added since, so writers never overwrite each other and history is not
+rebuilt from scratch on every turn. Counters start from the clock, so one
+recreated after eviction never reuses a version with a stale snapshot.
+"""
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .models import Message
+from .serializers import MessageSerializer
+
+
+def _timeout():
+    return getattr(settings, "HISTORY_CACHE_TIMEOUT", 3600)
+
+
+def _version_key(conversation_id):
+    return f"chat:history:{conversation_id}:version"
+
+
+def _data_key(conversation_id, version):
+    return f"chat:history:{conversation_id}:v{version}"
+
+
+def _serialize(queryset):
+    return [dict(m) for m in MessageSerializer(queryset.order_by("created_at", "id"), many=True).data]
+
+
+def _snapshot(messages, version):
+    last_id = max((m["id"] for m in messages), default=0)
+    return {"messages": messages, "last_id": last_id, "etag": f'W/"{len(messages)}-{last_id}-{version}"'}
+
+
+def get_history(conversation_id):
+    """Return ``{"messages", "last_id", "etag"}`` for a conversation, from cache if possible."""
+    version_key = _version_key(conversation_id)
+    seed = time.time_ns()
+    cache.add(version_key, seed, None)
+    version = cache.get(version_key, seed)
+
+    data = cache.get(_data_key(conversation_id, version))
+    if data is None:
+        data = _snapshot(_serialize(Message.objects.filter(conversation_id=conversation_id)), version)
+        cache.set(_data_key(conversation_id, version), data, _timeout())
+    return data
+
+
+def messages_after(history, after_id):
+    """Slice cached history down to messages newer than ``after_id``."""
+    return [m for m in history["messages"] if m["id"] > after_id]
+
+
+def record_message(message):
+    """Extend the cached history with ``message`` (and anything saved concurrently)."""
+    conversation_id = message.conversation_id
+    try:
+        version = cache.incr(_version_key(conversation_id))
+    except ValueError:
+        return  # nothing cached yet, the next read builds it
+
+    previous = cache.get(_data_key(conversation_id, version - 1))
+    if previous is None:
+        return  # next read rebuilds at the new version
+
+    delta = _serialize(
+        Message.objects.filter(conversation_id=conversation_id, id__gt=previous["last_id"])
+    )
+    cache.set(_data_key(conversation_id, version), _snapshot(previous["messages"] + delta, version), _timeout())
+    cache.delete(_data_key(conversation_id, version - 1))
+
+
+def invalidate(conversation_id):
+    """Force the next read to rebuild history from the database."""
+    try:
+        version = cache.incr(_version_key(conversation_id))
+    except ValueError:
+        return
+    cache.delete(_data_key(conversation_id, version - 1))
+
+
+def conversation_etag(conversation_data, history):
+    """ETag covering the serialized conversation fields as well as its messages."""
+    state = json.dumps(conversation_data, sort_keys=True, default=str)
+    digest = hashlib.md5(state.encode("utf-8")).hexdigest()[:12]
+    return f'{history["etag"][:-1]}-{digest}"'
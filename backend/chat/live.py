@@ -0,0 +1,179 @@
+"""
+Live updates pushed to browsers over WebSocket.
+
+Views, signals and commands publish events to topics (``dashboard`` and
+``conversation:<id>``); ``websocket_application`` is a plain ASGI handler
+that forwards them to subscribed sockets. The default broker only reaches
+sockets served by the same process; point ``LIVE_BROKER`` at a shared
+implementation with the same ``subscribe``/``unsubscribe``/``publish``
+interface to fan out across workers.
+"""
+import asyncio
+import json
+import re
+import threading
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DASHBOARD = "dashboard"
+TOPIC_RE = re.compile(r"^(dashboard|conversation:\d+)$")
+
+
+def conversation_topic(conversation_id):
+    return f"conversation:{conversation_id}"
+
+
+class Subscriber:
+    """One socket's bounded inbox, drained on the server's event loop."""
+
+    def __init__(self, loop, queue_size=100):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, message):
+        """Thread-safe: hand ``message`` to the event loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def _put(self, message):
+        # Slow consumers lose the oldest events rather than blocking publishers.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class InMemoryBroker:
+    """Process-local topic fan-out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, topic, subscriber):
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+
+    def unsubscribe(self, topic, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            targets = list(self._subscribers.get(topic, ()))
+        for subscriber in targets:
+            subscriber.deliver(message)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, "LIVE_BROKER", "chat.live.InMemoryBroker"))()
+        return _broker
+
+
+# ----------------------------------------------------------------------
+# PUBLISHING
+# ----------------------------------------------------------------------
+def publish(topic, event_type, data):
+    """Publish an event once the current transaction (if any) commits."""
+    message = json.dumps({"type": event_type, "topic": topic, "data": data}, cls=DjangoJSONEncoder)
+
+    def send():
+        try:
+            get_broker().publish(topic, message)
+        except Exception as e:
+            print(f" Live update publish failed: {e}")
+
+    transaction.on_commit(send)
+
+
+def publish_status(conversation_id, status, **extra):
+    publish(conversation_topic(conversation_id), "conversation.status", {"id": conversation_id, "status": status, **extra})
+
+
+def publish_stats(**delta):
+    """Dashboard counters to add to what the client already shows."""
+    publish(DASHBOARD, "stats.delta", delta)
+
+
+# ----------------------------------------------------------------------
+# ASGI WEBSOCKET HANDLER
+# ----------------------------------------------------------------------
+async def _forward(subscriber, send):
+    while True:
+        message = await subscriber.queue.get()
+        await send({"type": "websocket.send", "text": message})
+
+
+def _origin_allowed(scope):
+    """Apply the CORS origin settings to the handshake; browsers always send ``Origin``."""
+    origin = dict(scope.get("headers") or []).get(b"origin")
+    if origin is None or getattr(settings, "CORS_ALLOW_ALL_ORIGINS", False):
+        return True
+    origin = origin.decode("latin-1")
+    if origin in getattr(settings, "CORS_ALLOWED_ORIGINS", []):
+        return True
+    return any(re.match(pattern, origin) for pattern in getattr(settings, "CORS_ALLOWED_ORIGIN_REGEXES", []))
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ``/ws/chat/?topic=dashboard&topic=conversation:12``. Clients may also send
+    ``{"action": "subscribe" | "unsubscribe", "topic": ...}`` frames.
+    """
+    if (await receive())["type"] != "websocket.connect":
+        return
+    if scope.get("path") != getattr(settings, "LIVE_WEBSOCKET_PATH", "/ws/chat/"):
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    if not _origin_allowed(scope):
+        await send({"type": "websocket.close", "code": 4403})
+        return
+
+    await send({"type": "websocket.accept"})
+    broker = get_broker()
+    subscriber = Subscriber(asyncio.get_running_loop(), getattr(settings, "LIVE_QUEUE_SIZE", 100))
+    query = parse_qs(scope.get("query_string", b"").decode())
+    topics = {t for t in query.get("topic", []) if TOPIC_RE.match(t)}
+    for topic in topics:
+        broker.subscribe(topic, subscriber)
+
+    writer = asyncio.create_task(_forward(subscriber, send))
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event["type"] != "websocket.receive" or not event.get("text"):
+                continue
+            try:
+                frame = json.loads(event["text"])
+            except ValueError:
+                continue
+            topic = str(frame.get("topic", ""))
+            if not TOPIC_RE.match(topic):
+                continue
+            if frame.get("action") == "subscribe":
+                topics.add(topic)
+                broker.subscribe(topic, subscriber)
+            elif frame.get("action") == "unsubscribe":
+                topics.discard(topic)
+                broker.unsubscribe(topic, subscriber)
+    finally:
+        writer.cancel()
+        for topic in topics:
+            broker.unsubscribe(topic, subscriber)
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from chat.models import Conversation
+from chat.archive import archive_conversation
+from chat import partitions
+
+
+class Command(BaseCommand):
+    help = "Archive messages of long-ended conversations and maintain monthly message partitions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=getattr(settings, "MESSAGE_RETENTION_DAYS", 365),
+            help="Archive conversations that ended more than this many days ago.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=1000,
+            help="Maximum number of conversations to archive in one run.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options["days"])
+
+        convos = Conversation.objects.filter(
+            status="ended", ended_at__lt=cutoff, archived_at__isnull=True
+        ).order_by("ended_at")[:options["limit"]]
+
+        archived = messages = 0
+        for convo in convos:
+            messages += archive_conversation(convo)
+            archived += 1
+        self.stdout.write(f"{archived} conversations archived ({messages} messages).")
+
+        if partitions.is_partitioned():
+            created = partitions.ensure_partitions(now.date(), (now + timedelta(days=62)).date())
+            dropped = partitions.drop_empty_partitions(partitions.month_start(cutoff.date()))
+            self.stdout.write(f"{len(created)} partitions created, {len(dropped)} empty partitions dropped.")
@@ -2,13 +2,23 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from chat.models import Conversation
+from chat import live
 
 class Command(BaseCommand):
     help = "Auto-end conversations idle for more than 10 minutes."
 
     def handle(self, *args, **options):
         idle_time = timezone.now() - timedelta(minutes=10)
-        ended = Conversation.objects.filter(
+        ids = list(Conversation.objects.filter(
             status='active', messages__created_at__lt=idle_time
-        ).update(status='ended', ended_at=timezone.now())
+        ).values_list('id', flat=True).distinct())
+        ended = Conversation.objects.filter(id__in=ids, status='active').update(
+            status='ended', ended_at=timezone.now()
+        )
+
+        # Reaches sockets only when LIVE_BROKER is shared across processes.
+        for conv_id in ids:
+            live.publish_status(conv_id, "ended", reason="auto_ended")
+        if ended:
+            live.publish_stats(active=-ended, ended=ended)
         self.stdout.write(f"{ended} conversations auto-ended.")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from chat.models import Conversation
+from chat.ai_service import get_ai_service
+from chat import topics
+
+
+class Command(BaseCommand):
+    help = "Embed ended conversation summaries and cluster them into topics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Re-fit all topics from scratch.")
+        parser.add_argument("--clusters", type=int, default=None, help="Number of topics (default: TOPIC_CLUSTERS).")
+        parser.add_argument("--batch-size", type=int, default=256)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # Backfill summary embeddings; the dispatcher batches these requests.
+        missing = list(
+            Conversation.objects.filter(status="ended", summary_embedding__isnull=True)
+            .exclude(ai_summary=None).exclude(ai_summary="")
+            .exclude(metadata__has_key="summary_error")
+        )
+        embedded = []
+        if missing:
+            vectors = get_ai_service().embed_for_storage([c.ai_summary for c in missing])
+            for convo, vector in zip(missing, vectors):
+                if vector is not None:
+                    convo.summary_embedding = vector
+                    embedded.append(convo)
+            Conversation.objects.bulk_update(embedded, ["summary_embedding"], batch_size=500)
+        self.stdout.write(f"{len(embedded)} of {len(missing)} summary embeddings computed.")
+
+        if options["rebuild"]:
+            k = topics.rebuild_topics(k=options["clusters"], batch_size=batch_size)
+            self.stdout.write(f"Rebuilt {k} topics.")
+            return
+
+        pending = topics.clusterable().filter(topic=None).order_by("id")
+        assigned, last_id = 0, 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            vectors = [(c, topics.conversation_vector(c)) for c in batch]
+            vectors = [(c, v) for c, v in vectors if v is not None]
+            topics.assign_conversations([c for c, _ in vectors], [v for _, v in vectors])
+            assigned += len(vectors)
+        self.stdout.write(f"{assigned} conversations assigned to topics.")
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_message_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="owner_key",
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="conversation",
+            constraint=models.UniqueConstraint(condition=models.Q(("status", "active")), fields=("owner_key",), name="one_active_conversation_per_owner"),
+        ),
+    ]
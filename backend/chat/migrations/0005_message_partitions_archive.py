@@ -0,0 +1,98 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:44
+
+from django.db import migrations, models
+from django.utils import timezone
+from datetime import timedelta
+
+
+def partition_messages(apps, schema_editor):
+    """Rebuild chat_message as a table range-partitioned by month on created_at."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    from chat.partitions import ensure_partition, months_between
+
+    Message = apps.get_model("chat", "Message")
+    conversation = Message._meta.get_field("conversation")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE chat_message RENAME TO chat_message_legacy")
+        cursor.execute(
+            """
+            CREATE TABLE chat_message (
+                id bigint NOT NULL,
+                sender varchar(10) NOT NULL,
+                content text NOT NULL,
+                created_at timestamp with time zone NOT NULL,
+                conversation_id bigint NOT NULL,
+                embedding jsonb NULL
+            ) PARTITION BY RANGE (created_at)
+            """
+        )
+        cursor.execute("CREATE TABLE chat_message_default PARTITION OF chat_message DEFAULT")
+
+        cursor.execute("SELECT MIN(created_at) FROM chat_message_legacy")
+        first = cursor.fetchone()[0] or timezone.now()
+        last = timezone.now() + timedelta(days=62)
+        for start in months_between(first.date(), last.date()):
+            ensure_partition(cursor, start)
+
+        cursor.execute(
+            "INSERT INTO chat_message (id, sender, content, created_at, conversation_id, embedding) "
+            "SELECT id, sender, content, created_at, conversation_id, embedding FROM chat_message_legacy"
+        )
+        cursor.execute("DROP TABLE chat_message_legacy")
+
+        # Partitioned tables need the partition key in the primary key.
+        cursor.execute("ALTER TABLE chat_message ADD CONSTRAINT chat_message_pkey PRIMARY KEY (id, created_at)")
+        cursor.execute("CREATE SEQUENCE chat_message_id_seq OWNED BY chat_message.id")
+        cursor.execute("SELECT setval('chat_message_id_seq', COALESCE((SELECT MAX(id) FROM chat_message), 0) + 1, false)")
+        cursor.execute("ALTER TABLE chat_message ALTER COLUMN id SET DEFAULT nextval('chat_message_id_seq')")
+
+    for sql in schema_editor._field_indexes_sql(Message, conversation):
+        schema_editor.execute(sql)
+    schema_editor.execute(
+        schema_editor._create_fk_sql(Message, conversation, "_fk_%(to_table)s_%(to_column)s")
+    )
+
+
+def unpartition_messages(apps, schema_editor):
+    """Copy messages back into a plain, unpartitioned chat_message table."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Message = apps.get_model("chat", "Message")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE chat_message_backup AS SELECT * FROM chat_message")
+        cursor.execute("DROP TABLE chat_message CASCADE")
+    schema_editor.create_model(Message)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO chat_message (id, sender, content, created_at, conversation_id, embedding) "
+            "SELECT id, sender, content, created_at, conversation_id, embedding FROM chat_message_backup"
+        )
+        cursor.execute("DROP TABLE chat_message_backup")
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('chat_message', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM chat_message), 0) + 1, false)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_conversation_owner_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="archived_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(partition_messages, unpartition_messages),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["conversation", "created_at"], name="chat_msg_conv_created_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_message_partitions_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TopicCluster",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("label", models.CharField(blank=True, max_length=255)),
+                ("keywords", models.JSONField(blank=True, default=dict)),
+                ("centroid", models.JSONField(default=list)),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("representatives", models.JSONField(blank=True, default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-size"],
+            },
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="summary_embedding",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="topic",
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="conversations", to="chat.topiccluster"),
+        ),
+    ]
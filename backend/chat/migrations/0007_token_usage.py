@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_topic_clusters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyUsage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField(unique=True)),
+                ("requests", models.PositiveIntegerField(default=0)),
+                ("prompt_tokens", models.PositiveBigIntegerField(default=0)),
+                ("completion_tokens", models.PositiveBigIntegerField(default=0)),
+                ("cost", models.DecimalField(decimal_places=6, default=0, max_digits=14)),
+            ],
+            options={
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="completion_tokens",
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="cost",
+            field=models.DecimalField(db_default=0, decimal_places=6, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="prompt_tokens",
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="total_tokens",
+            field=models.PositiveIntegerField(db_default=0, db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="completion_tokens",
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="prompt_tokens",
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+    ]
@@ -1,14 +1,136 @@
-from django.db import models
+import json
+from django.db import models, connection, transaction, IntegrityError
 from django.utils import timezone
 
+
+class ConversationManager(models.Manager):
+    def start_for_owner(self, owner_key, title, metadata=None):
+        """
+        End the owner's active conversation (if any) and open a new one.
+        Only rows belonging to ``owner_key`` are touched. Returns
+        ``(conversation, ids_of_ended_conversations)``.
+        """
+        metadata = metadata or {}
+        now = timezone.now()
+
+        if connection.vendor != "postgresql":
+            with transaction.atomic(using=self.db):
+                active = self.select_for_update().filter(owner_key=owner_key, status='active')
+                ended_ids = list(active.values_list('id', flat=True))
+                active.update(status='ended', ended_at=now)
+                return self.create(
+                    owner_key=owner_key, title=title, status='active',
+                    started_at=now, metadata=metadata,
+                ), ended_ids
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        # The aggregate over ``closed`` forces the UPDATE to finish before the
+        # INSERT runs, so the partial unique index never sees two active rows.
+        sql = f"""
+            WITH closed AS (
+                UPDATE {table} SET status = 'ended', ended_at = %s
+                WHERE owner_key = %s AND status = 'active'
+                RETURNING id
+            ), created AS (
+                INSERT INTO {table} (owner_key, title, status, started_at, metadata)
+                SELECT %s, %s, 'active', %s, %s::jsonb FROM (SELECT COUNT(*) FROM closed) AS c
+                RETURNING id
+            )
+            SELECT (SELECT id FROM created), ARRAY(SELECT id FROM closed)
+        """
+        params = [now, owner_key, owner_key, title, now, json.dumps(metadata)]
+
+        # A concurrent create for the same owner can win the race on the
+        # unique index; retrying with a fresh snapshot ends that one instead.
+        for attempt in range(2):
+            try:
+                with transaction.atomic(using=self.db), connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    pk, ended_ids = cursor.fetchone()
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+
+        convo = self.model(
+            id=pk, owner_key=owner_key, title=title, status='active',
+            started_at=now, metadata=metadata,
+        )
+        convo._state.adding = False
+        convo._state.db = self.db
+        return convo, list(ended_ids)
+
+    def activate(self, convo):
+        """
+        Make ``convo`` the owner's active conversation, ending any other.
+        Returns the ids of the conversations that were ended.
+        """
+        # As in start_for_owner, a concurrent create can take the unique index
+        # between the lock and the update; a retry locks and ends that row too.
+        for attempt in range(2):
+            ended_ids = []
+            try:
+                with transaction.atomic(using=self.db):
+                    if convo.owner_key:
+                        others = self.select_for_update().filter(
+                            owner_key=convo.owner_key, status='active'
+                        ).exclude(id=convo.id)
+                        ended_ids = list(others.values_list('id', flat=True))
+                        others.update(status='ended', ended_at=timezone.now())
+                    self.filter(id=convo.id).update(status='active')
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+        convo.status = 'active'
+        return ended_ids
+
+
+class TopicCluster(models.Model):
+    label = models.CharField(max_length=255, blank=True)
+    keywords = models.JSONField(default=dict, blank=True)
+    centroid = models.JSONField(default=list)
+    size = models.PositiveIntegerField(default=0)
+    representatives = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-size']
+
+    def __str__(self):
+        return self.label or f"Topic {self.id}"
+
+
 class Conversation(models.Model):
     STATUS_CHOICES = (('active','Active'),('ended','Ended'))
+    owner_key = models.CharField(max_length=128, null=True, blank=True)
     title = models.CharField(max_length=255, blank=True, null=True)
     started_at = models.DateTimeField(default=timezone.now)
     ended_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
     ai_summary = models.TextField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(null=True, blank=True)
+    summary_embedding = models.JSONField(null=True, blank=True)
+    topic = models.ForeignKey(
+        TopicCluster, null=True, blank=True, on_delete=models.SET_NULL, related_name='conversations'
+    )
+    # db_default keeps raw INSERTs (see start_for_owner) valid on PostgreSQL.
+    prompt_tokens = models.PositiveIntegerField(default=0, db_default=0)
+    completion_tokens = models.PositiveIntegerField(default=0, db_default=0)
+    total_tokens = models.PositiveIntegerField(default=0, db_default=0, db_index=True)
+    cost = models.DecimalField(max_digits=12, decimal_places=6, default=0, db_default=0)
+
+    objects = ConversationManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner_key'],
+                condition=models.Q(status='active'),
+                name='one_active_conversation_per_owner',
+            ),
+        ]
 
     def __str__(self):
         return self.title or f"Conversation {self.id}"
@@ -20,9 +142,28 @@ class Message(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     embedding = models.JSONField(null=True, blank=True)
+    prompt_tokens = models.PositiveIntegerField(default=0, db_default=0)
+    completion_tokens = models.PositiveIntegerField(default=0, db_default=0)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='chat_msg_conv_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender}: {self.content[:40]}"
+
+
+class DailyUsage(models.Model):
+    day = models.DateField(unique=True)
+    requests = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.prompt_tokens + self.completion_tokens} tokens"
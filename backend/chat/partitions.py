@@ -0,0 +1,98 @@
+"""
+Monthly range partitions for ``chat_message`` (PostgreSQL only).
+
+The parent table is partitioned on ``created_at``; rows outside every
+monthly partition land in ``chat_message_default`` and are moved out when
+their month's partition is created.
+"""
+from datetime import date
+from django.db import connection, transaction
+
+PARENT = "chat_message"
+DEFAULT_PARTITION = "chat_message_default"
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(start):
+    return f"{PARENT}_y{start.year}m{start.month:02d}"
+
+
+def months_between(first, last):
+    """Yield the first day of every month from ``first`` to ``last`` inclusive."""
+    current = month_start(first)
+    while current <= month_start(last):
+        yield current
+        current = next_month(current)
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [PARENT])
+        return cursor.fetchone() is not None
+
+
+def ensure_partition(cursor, start):
+    """Create the partition for the month starting at ``start`` if missing."""
+    name = partition_name(start)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    end = next_month(start)
+    # Build it detached, pull matching rows out of the default partition,
+    # then attach, so the default partition never blocks the new range.
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{PARENT}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+        f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        [start.isoformat(), end.isoformat()],
+    )
+    cursor.execute(
+        f'ALTER TABLE "{PARENT}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+        [start.isoformat(), end.isoformat()],
+    )
+    return True
+
+
+def ensure_partitions(first, last):
+    """Make sure monthly partitions exist for every month in ``[first, last]``."""
+    created = []
+    for start in months_between(first, last):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if ensure_partition(cursor, start):
+                created.append(partition_name(start))
+    return created
+
+
+def drop_empty_partitions(before):
+    """Drop monthly partitions that end on or before ``before`` and hold no rows."""
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) AND c.relname <> %s ORDER BY c.relname",
+            [PARENT, DEFAULT_PARTITION],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    for name in names:
+        year, month = int(name[-7:-3]), int(name[-2:])
+        if next_month(date(year, month, 1)) > before:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM "{name}" LIMIT 1')
+            if cursor.fetchone() is None:
+                cursor.execute(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+                dropped.append(name)
+    return dropped
@@ -4,10 +4,17 @@ from .models import Conversation, Message
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = ['id','sender','content','created_at']
+        fields = ['id','sender','content','created_at','prompt_tokens','completion_tokens']
 
 class ConversationSerializer(serializers.ModelSerializer):
     messages = MessageSerializer(many=True, read_only=True)
     class Meta:
         model = Conversation
-        fields = ['id','title','status','started_at','ended_at','ai_summary','messages','metadata']
+        fields = ['id','title','status','started_at','ended_at','ai_summary','messages','metadata',
+                  'prompt_tokens','completion_tokens','total_tokens','cost']
+
+class ConversationMetaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Conversation
+        fields = ['id','title','status','started_at','ended_at','ai_summary','metadata',
+                  'prompt_tokens','completion_tokens','total_tokens','cost']
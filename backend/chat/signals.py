@@ -1,25 +1,45 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Message
-import openai, os
+from .ai_service import get_ai_service
+from . import history, live
+from .serializers import MessageSerializer
+
+
+@receiver(post_save, sender=Message)
+def update_message_history(sender, instance, created, update_fields=None, **kwargs):
+    """Append new messages to the cached conversation history; edits invalidate it."""
+    if created:
+        history.record_message(instance)
+        live.publish(
+            live.conversation_topic(instance.conversation_id),
+            "message.created",
+            MessageSerializer(instance).data,
+        )
+    elif update_fields is None or set(update_fields) != {"embedding"}:
+        # Embeddings are not part of the serialized history.
+        history.invalidate(instance.conversation_id)
+
+
+@receiver(post_delete, sender=Message)
+def invalidate_message_history(sender, instance, **kwargs):
+    history.invalidate(instance.conversation_id)
 
-# Initialize OpenAI API key safely
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 @receiver(post_save, sender=Message)
 def generate_message_embedding(sender, instance, created, **kwargs):
     """Automatically generate embeddings when a new message is saved."""
-    if not openai.api_key:
+    ai = get_ai_service()
+    if not ai.use_openai:
         print(" OpenAI API key not found — skipping embedding generation.")
         return
 
     if created and instance.content and not instance.embedding:
         try:
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                input=instance.content
-            )
-            instance.embedding = response.data[0].embedding
-            instance.save(update_fields=["embedding"])
+            # Shares the service's dispatcher, so identical texts from search coalesce.
+            vector = ai.embed_for_storage([instance.content], dim=None)[0]
+            if vector is not None:
+                instance.embedding = vector
+                instance.save(update_fields=["embedding"])
         except Exception as e:
             print(" Failed to generate embedding:", e)
@@ -1,3 +1,566 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+from decimal import Decimal
+from datetime import date
+import unittest
+from unittest import mock
+from io import StringIO
+import threading
+import time
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from .ai_service import EmbeddingDispatcher
+from .archive import archive_conversation, archive_path, ensure_hot, ArchiveUnavailable
+from .models import Conversation, DailyUsage, Message, TopicCluster
+from .usage import cost_of, record_usage, usage_overview
+from . import history, partitions, topics
+from .live import websocket_application
+from .ai_service import AIService, FallbackEmbedding, get_ai_service
+from .admission import AdmissionScheduler, AdmissionRejected, INTERACTIVE, SUMMARY, EMBEDDING
 
-# Create your tests here.
+
+class EmbeddingDispatcherTests(SimpleTestCase):
+    def test_identical_texts_share_one_call(self):
+        calls = []
+        release = threading.Event()
+
+        def embed_batch(texts):
+            calls.append(list(texts))
+            release.wait(1)
+            return [[float(len(t))] for t in texts]
+
+        dispatcher = EmbeddingDispatcher(embed_batch, window_ms=20)
+        futures = [dispatcher.submit("same") for _ in range(5)]
+        release.set()
+
+        self.assertEqual(len({id(f) for f in futures}), 1)
+        self.assertEqual(futures[0].result(2), [4.0])
+        self.assertEqual(calls, [["same"]])
+
+    def test_concurrent_requests_are_batched(self):
+        calls = []
+
+        def embed_batch(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        dispatcher = EmbeddingDispatcher(embed_batch, window_ms=50, max_batch_size=3)
+        futures = [dispatcher.submit(f"text-{i}") for i in range(5)]
+
+        self.assertEqual([f.result(2) for f in futures], [[6.0]] * 5)
+        self.assertEqual([len(batch) for batch in calls], [3, 2])
+
+    def test_batches_are_capped_by_token_budget(self):
+        calls = []
+
+        def embed_batch(texts):
+            calls.append(list(texts))
+            return [[1.0] for _ in texts]
+
+        dispatcher = EmbeddingDispatcher(embed_batch, window_ms=50, max_batch_tokens=4)
+        futures = [dispatcher.submit(f"text-{i:03d}") for i in range(3)]
+
+        for fut in futures:
+            fut.result(2)
+        self.assertEqual([len(batch) for batch in calls], [2, 1])
+
+    def test_short_result_fails_every_caller(self):
+        dispatcher = EmbeddingDispatcher(lambda texts: [[1.0]] * (len(texts) - 1), window_ms=20)
+        futures = [dispatcher.submit(t) for t in ("a", "b", "c")]
+
+        for fut in futures:
+            with self.assertRaises(ValueError):
+                fut.result(2)
+
+    def test_provider_error_is_propagated_and_not_cached(self):
+        attempts = []
+
+        def embed_batch(texts):
+            attempts.append(texts)
+            if len(attempts) == 1:
+                raise RuntimeError("provider down")
+            return [[1.0] for _ in texts]
+
+        dispatcher = EmbeddingDispatcher(embed_batch, window_ms=1)
+        with self.assertRaises(RuntimeError):
+            dispatcher.embed("x", timeout=2)
+        self.assertEqual(dispatcher.embed("x", timeout=2), [1.0])
+
+    def test_embed_times_out_instead_of_hanging(self):
+        dispatcher = EmbeddingDispatcher(lambda texts: time.sleep(1) or [[1.0]], window_ms=1, timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            dispatcher.embed("slow")
+
+
+class AdmissionSchedulerTests(SimpleTestCase):
+    def make(self, tpm, reserve=0.0, **kwargs):
+        return AdmissionScheduler(
+            rate_limits={"test": {"rpm": 100000, "tpm": tpm}},
+            background_reserve=reserve,
+            **kwargs,
+        )
+
+    def test_higher_priority_is_served_first(self):
+        scheduler = self.make(tpm=6000)
+        scheduler.admit("test", INTERACTIVE, tokens=6000)  # drain the bucket
+        order = []
+
+        def call(priority):
+            scheduler.admit("test", priority, tokens=10, deadline=5)
+            order.append(priority)
+
+        background = threading.Thread(target=call, args=(EMBEDDING,))
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=call, args=(INTERACTIVE,))
+        interactive.start()
+        background.join(5)
+        interactive.join(5)
+
+        self.assertEqual(order, [INTERACTIVE, EMBEDDING])
+
+    def test_background_calls_leave_the_interactive_reserve(self):
+        scheduler = self.make(tpm=600, reserve=0.5)
+        scheduler.admit("test", INTERACTIVE, tokens=400)
+
+        with self.assertRaises(AdmissionRejected):
+            scheduler.admit("test", SUMMARY, tokens=1, deadline=0.05)
+        scheduler.admit("test", INTERACTIVE, tokens=100, deadline=0.05)
+
+        metrics = scheduler.metrics()["test"]
+        self.assertEqual(metrics["summary"]["shed"], 1)
+        self.assertEqual(metrics["interactive"]["admitted"], 2)
+
+    def test_oversized_background_call_is_rejected_immediately(self):
+        scheduler = self.make(tpm=1000, reserve=0.2)
+        self.assertEqual(scheduler.max_tokens("test", EMBEDDING), 800)
+        self.assertEqual(scheduler.max_tokens("test", INTERACTIVE), 1000)
+
+        started = time.monotonic()
+        with self.assertRaises(AdmissionRejected):
+            scheduler.admit("test", EMBEDDING, tokens=801, deadline=5)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(scheduler.metrics()["test"]["embedding"]["shed"], 1)
+
+    def test_completion_tokens_are_charged_after_the_call(self):
+        scheduler = self.make(tpm=600, reserve=0.5)
+        scheduler.admit("test", INTERACTIVE, tokens=100)
+        scheduler.charge("test", 300)  # the reply used more than the prompt estimate
+
+        with self.assertRaises(AdmissionRejected):
+            scheduler.admit("test", SUMMARY, tokens=1, deadline=0.05)
+
+        scheduler.charge("test", -300)
+        scheduler.admit("test", SUMMARY, tokens=1, deadline=0.05)
+
+    def test_full_queue_is_shed(self):
+        scheduler = self.make(tpm=1000, max_queue={INTERACTIVE: 1, SUMMARY: 1, EMBEDDING: 0})
+
+        with self.assertRaises(AdmissionRejected):
+            scheduler.admit("test", EMBEDDING)
+        scheduler.admit("test", SUMMARY)
+
+        metrics = scheduler.metrics()["test"]
+        self.assertEqual(metrics["embedding"], {"queued": 0, "admitted": 0, "shed": 1})
+        self.assertEqual(metrics["summary"]["admitted"], 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MESSAGE_ARCHIVE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.convo = Conversation.objects.create(title="Old", status="ended", ended_at=timezone.now())
+        for content in ("hello", "hi there"):
+            Message.objects.create(conversation=self.convo, sender="user", content=content)
+
+    def test_round_trip(self):
+        self.assertEqual(archive_conversation(self.convo), 2)
+        self.convo.refresh_from_db()
+        self.assertIsNotNone(self.convo.archived_at)
+        self.assertFalse(Message.objects.filter(conversation=self.convo).exists())
+
+        ensure_hot(self.convo)
+        self.convo.refresh_from_db()
+        self.assertIsNone(self.convo.archived_at)
+        self.assertEqual(
+            list(Message.objects.filter(conversation=self.convo).values_list("content", flat=True)),
+            ["hello", "hi there"],
+        )
+        self.assertFalse(archive_path(self.convo.id).exists())
+
+    def test_skips_conversations_that_are_no_longer_archivable(self):
+        Conversation.objects.filter(id=self.convo.id).update(status="active")
+
+        self.assertEqual(archive_conversation(self.convo), 0)
+        self.assertEqual(Message.objects.filter(conversation=self.convo).count(), 2)
+        self.assertFalse(archive_path(self.convo.id).exists())
+
+    def test_missing_file_keeps_conversation_archived(self):
+        archive_conversation(self.convo)
+        archive_path(self.convo.id).unlink()
+        self.convo.refresh_from_db()
+
+        with self.assertRaises(ArchiveUnavailable):
+            ensure_hot(self.convo)
+        self.convo.refresh_from_db()
+        self.assertIsNotNone(self.convo.archived_at)
+
+
+class TopicTests(TestCase):
+    def make_conversation(self, vector, summary=False):
+        convo = Conversation.objects.create(
+            status="ended", ended_at=timezone.now(),
+            summary_embedding=vector if summary else None,
+        )
+        if not summary:
+            Message.objects.create(conversation=convo, sender="user", content="hi", embedding=vector)
+        return convo
+
+    def test_rebuild_and_pending_cover_message_embedding_fallback(self):
+        with_summary = self.make_conversation([1.0, 0.0], summary=True)
+        fallback = self.make_conversation([0.0, 1.0])
+        Conversation.objects.create(status="ended", ended_at=timezone.now())
+
+        self.assertEqual(set(topics.clusterable().values_list("id", flat=True)), {with_summary.id, fallback.id})
+
+        topics.rebuild_topics(k=2)
+        self.assertEqual(Conversation.objects.filter(topic__isnull=False).count(), 2)
+
+        Conversation.objects.update(topic=None)
+        call_command("cluster_topics", stdout=StringIO())
+        self.assertEqual(Conversation.objects.filter(topic__isnull=False).count(), 2)
+
+    def test_assignment_seeds_then_joins_nearest_topic(self):
+        with override_settings(TOPIC_CLUSTERS=2):
+            first = self.make_conversation([1.0, 0.0], summary=True)
+            second = self.make_conversation([0.0, 1.0], summary=True)
+            third = self.make_conversation([0.9, 0.1], summary=True)
+            for convo in (first, second, third):
+                topics.assign_conversation(convo)
+
+        self.assertEqual(TopicCluster.objects.count(), 2)
+        first.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual(third.topic_id, first.topic_id)
+        self.assertEqual(third.topic.size, 2)
+
+    def test_fallback_embeddings_are_not_stored(self):
+        convo = Conversation.objects.create(status="ended", ended_at=timezone.now(), ai_summary="billing issue")
+        with mock.patch.object(get_ai_service().embeddings, "_embed_batch", lambda texts: [FallbackEmbedding([1.0]) for _ in texts]):
+            call_command("cluster_topics", stdout=StringIO())
+
+        convo.refresh_from_db()
+        self.assertIsNone(convo.summary_embedding)
+
+    def test_keywords_are_ordered_by_count(self):
+        TopicCluster.objects.create(keywords={"rare": 1, "common": 9, "middle": 4})
+        self.assertEqual(topics.top_topics()[0]["keywords"], ["common", "middle", "rare"])
+
+    def test_negative_limit_is_clamped(self):
+        TopicCluster.objects.create(label="billing", size=3)
+        response = self.client.get("/api/chat/topics/", {"limit": -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["topics"]), 1)
+
+
+class StartForOwnerTests(TestCase):
+    def test_token_columns_default_in_the_database(self):
+        table = connection.ops.quote_name(Conversation._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (owner_key, title, status, started_at, metadata) VALUES (%s, %s, %s, %s, %s)",
+                ["raw", "Raw", "ended", timezone.now(), "{}"],
+            )
+        convo = Conversation.objects.get(owner_key="raw")
+        self.assertEqual((convo.prompt_tokens, convo.completion_tokens, convo.total_tokens, convo.cost), (0, 0, 0, 0))
+
+    def test_ends_previous_active_conversation(self):
+        first, ended = Conversation.objects.start_for_owner("owner", "First")
+        self.assertEqual(ended, [])
+        second, ended = Conversation.objects.start_for_owner("owner", "Second")
+        Conversation.objects.start_for_owner("other", "Other")
+
+        self.assertEqual(ended, [first.id])
+        self.assertEqual(
+            list(Conversation.objects.filter(status="active").order_by("id").values_list("title", flat=True)),
+            ["Second", "Other"],
+        )
+        second.refresh_from_db()
+        self.assertEqual(second.total_tokens, 0)
+
+    def test_activate_ends_the_owners_other_conversation(self):
+        old, _ = Conversation.objects.start_for_owner("owner", "Old")
+        new, _ = Conversation.objects.start_for_owner("owner", "New")
+
+        self.assertEqual(Conversation.objects.activate(old), [new.id])
+        self.assertEqual(
+            list(Conversation.objects.filter(owner_key="owner", status="active").values_list("id", flat=True)),
+            [old.id],
+        )
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "exercises the PostgreSQL CTE and its retry")
+class ConcurrentStartForOwnerTests(TransactionTestCase):
+    def race(self, *calls):
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def run(call):
+            try:
+                barrier.wait()
+                call()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Conversation.objects.filter(owner_key="racer", status="active").count(), 1)
+
+    def test_racing_creates_leave_one_active_conversation(self):
+        create = lambda: Conversation.objects.start_for_owner("racer", "New")
+        for _ in range(10):
+            self.race(create, create)
+
+    def test_activate_racing_a_create(self):
+        old, _ = Conversation.objects.start_for_owner("racer", "Old")
+        for _ in range(10):
+            Conversation.objects.filter(id=old.id).update(status="ended")
+            self.race(
+                lambda: Conversation.objects.activate(old),
+                lambda: Conversation.objects.start_for_owner("racer", "New"),
+            )
+
+
+@override_settings(
+    LIVE_WEBSOCKET_PATH="/ws/chat/",
+    CORS_ALLOW_ALL_ORIGINS=False,
+    CORS_ALLOWED_ORIGINS=["http://localhost:3000"],
+    CORS_ALLOWED_ORIGIN_REGEXES=[r"^https://\w+\.example\.com$"],
+)
+class WebSocketOriginTests(SimpleTestCase):
+    def handshake(self, origin):
+        sent = []
+        events = [{"type": "websocket.connect"}, {"type": "websocket.disconnect"}]
+
+        async def receive():
+            return events.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "websocket", "path": "/ws/chat/", "query_string": b"", "headers": [(b"origin", origin)]}
+        asyncio.run(websocket_application(scope, receive, send))
+        return sent[0]
+
+    def test_allowed_origins_are_accepted(self):
+        self.assertEqual(self.handshake(b"http://localhost:3000")["type"], "websocket.accept")
+        self.assertEqual(self.handshake(b"https://app.example.com")["type"], "websocket.accept")
+
+    def test_foreign_origin_is_rejected(self):
+        self.assertEqual(self.handshake(b"https://evil.test"), {"type": "websocket.close", "code": 4403})
+
+
+@mock.patch("chat.ai_service.scheduler.admit", side_effect=AdmissionRejected("interactive queue for openai is full"))
+class SheddingTests(TestCase):
+    def setUp(self):
+        self.convo = Conversation.objects.create(title="Busy")
+
+    def test_rejected_turn_saves_nothing(self, admit):
+        response = self.client.post(f"/api/chat/{self.convo.id}/send/", {"content": "hello"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(Message.objects.filter(conversation=self.convo).exists())
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.status, "active")
+
+    def test_rejected_summary_leaves_conversation_open(self, admit):
+        response = self.client.post(f"/api/chat/{self.convo.id}/end/")
+
+        self.assertEqual(response.status_code, 429)
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.status, "active")
+        self.assertIsNone(self.convo.ai_summary)
+
+    def test_rejected_embedding_does_not_fall_back(self, admit):
+        with self.assertRaises(AdmissionRejected):
+            AIService()._embed_batch(["text"])
+
+
+class HistoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.convo = Conversation.objects.create(title="Cached")
+        self.a = Message.objects.create(conversation=self.convo, sender="user", content="a")
+        self.b = Message.objects.create(conversation=self.convo, sender="ai", content="b")
+        self.url = f"/api/chat/{self.convo.id}/messages/"
+
+    def contents(self, response):
+        return [m["content"] for m in response.json()]
+
+    def test_unchanged_history_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.contents(first), ["a", "b"])
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_new_message_is_appended_with_a_new_etag(self):
+        first = self.client.get(self.url)
+        Message.objects.create(conversation=self.convo, sender="user", content="c")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(response), ["a", "b", "c"])
+
+    def test_after_returns_only_newer_messages(self):
+        response = self.client.get(self.url, {"after": self.a.id})
+        self.assertEqual(self.contents(response), ["b"])
+        self.assertEqual(self.client.get(self.url, {"after": "x"}).status_code, 400)
+
+    def test_edit_invalidates_history(self):
+        first = self.client.get(self.url)
+        self.b.content = "EDITED"
+        self.b.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(response), ["a", "EDITED"])
+
+    def test_embedding_update_keeps_history(self):
+        first = self.client.get(self.url)
+        self.b.embedding = [1.0]
+        self.b.save(update_fields=["embedding"])
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+    def test_deleted_message_does_not_return_after_version_eviction(self):
+        self.client.get(self.url)
+        self.a.delete()
+        self.assertEqual(self.contents(self.client.get(self.url)), ["b"])
+
+        cache.delete(history._version_key(self.convo.id))
+        self.assertEqual(self.contents(self.client.get(self.url)), ["b"])
+
+
+class PartitionNamingTests(SimpleTestCase):
+    def test_months_between_crosses_year_end(self):
+        months = list(partitions.months_between(date(2025, 11, 20), date(2026, 1, 3)))
+        self.assertEqual(months, [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)])
+        self.assertEqual(partitions.partition_name(months[-1]), "chat_message_y2026m01")
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "message partitioning is PostgreSQL only")
+class MessagePartitionMigrationTests(TransactionTestCase):
+    before = "0004_conversation_owner_key"
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("chat", target)])
+
+    def contents(self, convo_id):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT content FROM chat_message WHERE conversation_id = %s ORDER BY id", [convo_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_partition_round_trip(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes("chat")[0][1]
+        self.addCleanup(self.migrate, latest)
+
+        self.migrate(self.before)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO chat_conversation (title, started_at, status, metadata) "
+                "VALUES ('Old', now(), 'ended', '{}') RETURNING id"
+            )
+            convo_id = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO chat_message (conversation_id, sender, content, created_at) "
+                "VALUES (%s, 'user', 'old', now() - interval '400 days'), (%s, 'ai', 'new', now())",
+                [convo_id, convo_id],
+            )
+
+        self.migrate(latest)
+        self.assertTrue(partitions.is_partitioned())
+        Message.objects.create(conversation_id=convo_id, sender="user", content="after")
+        self.assertEqual(self.contents(convo_id), ["old", "new", "after"])
+
+        self.assertEqual(partitions.ensure_partitions(date(2000, 1, 1), date(2000, 1, 1)), ["chat_message_y2000m01"])
+        self.assertIn("chat_message_y2000m01", partitions.drop_empty_partitions(date(2000, 3, 1)))
+
+        self.migrate(self.before)
+        self.assertFalse(partitions.is_partitioned())
+        self.assertEqual(self.contents(convo_id), ["old", "new", "after"])
+
+
+class SemanticSearchTests(TestCase):
+    def test_stored_summary_embeddings_are_not_re_embedded(self):
+        Conversation.objects.create(title="Stored", ai_summary="billing", summary_embedding=[1.0] + [0.0] * 127)
+        Conversation.objects.create(title="Pending", ai_summary="shipping")
+        ai = get_ai_service()
+        sent = []
+
+        def embed_batch(texts):
+            sent.extend(texts)
+            return [[1.0] for _ in texts]
+
+        with mock.patch.object(ai.embeddings, "_embed_batch", embed_batch):
+            results = ai.semantic_search("refund")
+
+        self.assertEqual(sorted(sent), ["refund", "shipping"])
+        self.assertEqual({r["title"] for r in results}, {"Stored", "Pending"})
+
+
+class UsageTests(TestCase):
+    def test_cost_uses_configured_pricing(self):
+        usage = {"model": "gpt-3.5-turbo", "prompt_tokens": 1000, "completion_tokens": 2000}
+        self.assertEqual(cost_of(usage), Decimal("0.003500"))
+        self.assertEqual(cost_of({**usage, "model": "local-model"}), Decimal("0"))
+
+    def test_record_usage_updates_conversation_and_day(self):
+        convo = Conversation.objects.create(title="Busy")
+        usage = {"model": "gpt-3.5-turbo", "prompt_tokens": 100, "completion_tokens": 50}
+        record_usage(convo.id, usage)
+        record_usage(convo.id, usage)
+        record_usage(convo.id, None)
+
+        convo.refresh_from_db()
+        self.assertEqual((convo.prompt_tokens, convo.completion_tokens, convo.total_tokens), (200, 100, 300))
+        self.assertEqual(convo.cost, Decimal("0.000250"))
+        self.assertEqual(DailyUsage.objects.get().requests, 2)
+
+        overview = usage_overview()
+        self.assertEqual(overview["daily"][0]["prompt_tokens"], 200)
+        self.assertEqual(overview["heaviest_conversations"][0]["id"], convo.id)
+
+    def test_missing_usage_is_estimated(self):
+        ai = get_ai_service()
+        messages = [{"role": "user", "content": "x" * 40}]
+        self.assertEqual(
+            ai._usage("gpt-3.5-turbo", None, messages, "y" * 20),
+            {"model": "gpt-3.5-turbo", "prompt_tokens": 10, "completion_tokens": 5, "estimated": True},
+        )
+
+    def test_lm_studio_reply_without_usage_is_estimated_and_free(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"choices": [{"message": {"content": "y" * 20}}]}
+        with mock.patch("chat.ai_service.requests.post", return_value=response):
+            reply, usage = get_ai_service()._use_lm_studio([{"role": "user", "content": "x" * 40}])
+
+        self.assertEqual(reply, "y" * 20)
+        self.assertEqual((usage["model"], usage["prompt_tokens"], usage["completion_tokens"]), ("local-model", 10, 5))
+        self.assertTrue(usage["estimated"])
+        self.assertEqual(cost_of(usage), Decimal("0"))
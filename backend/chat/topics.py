@@ -0,0 +1,216 @@
+"""
+Topic clustering over conversation summary embeddings.
+
+Clusters are spherical mini-batch k-means centroids stored in
+``TopicCluster``. Conversations are folded into the nearest centroid as
+they end; ``manage.py cluster_topics --rebuild`` re-fits all centroids.
+The topics endpoint only reads the precomputed rows.
+"""
+import re
+from collections import Counter
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from .models import Conversation, TopicCluster
+
+DIM = 128
+REPRESENTATIVES = 3
+MAX_KEYWORDS = 20
+
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "about", "into", "what", "when",
+    "user", "users", "assistant", "conversation", "asked", "asks", "discussed", "provided",
+    "are", "was", "were", "has", "have", "had", "how", "can", "their", "they", "them",
+    "also", "which", "while", "been", "being", "more", "some", "such", "than", "then",
+    "summary", "summarize", "sentiment", "keywords", "neutral", "positive", "negative",
+}
+
+
+def num_topics():
+    return getattr(settings, "TOPIC_CLUSTERS", 8)
+
+
+def _resize(vec):
+    vec = np.asarray(vec, dtype=float)
+    if len(vec) < DIM:
+        return np.pad(vec, (0, DIM - len(vec)))
+    return vec[:DIM]
+
+
+def _unit(X):
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    return X / np.maximum(norms, 1e-9)
+
+
+def conversation_vector(convo):
+    """Unit vector for a conversation: its summary embedding, else the mean of its message embeddings."""
+    if convo.summary_embedding:
+        return _unit(_resize(convo.summary_embedding))
+
+    embeddings = [
+        _resize(e) for e in convo.messages.filter(embedding__isnull=False).values_list("embedding", flat=True)
+    ]
+    if not embeddings:
+        return None
+    return _unit(np.mean(embeddings, axis=0))
+
+
+def clusterable():
+    """Ended conversations that ``conversation_vector`` can place."""
+    return Conversation.objects.filter(
+        Q(summary_embedding__isnull=False) | Q(messages__embedding__isnull=False),
+        status="ended",
+    ).distinct()
+
+
+def _terms(convo):
+    words = list(convo.metadata.get("keywords") or [])
+    words += re.findall(r"[a-z][a-z\-]{2,}", (convo.ai_summary or "").lower())
+    return [w.lower() for w in words if w.lower() not in STOPWORDS]
+
+
+def _absorb(cluster, convos, X):
+    """Fold conversations (rows of unit matrix ``X``) into ``cluster``."""
+    centroid = np.asarray(cluster.centroid, dtype=float)
+    total = cluster.size + len(convos)
+    centroid = _unit((cluster.size * centroid + X.sum(axis=0)) / total)
+    cluster.centroid = centroid.tolist()
+    cluster.size = total
+
+    sims = X @ centroid
+    candidates = list(cluster.representatives) + [
+        {"id": c.id, "title": c.title or f"Conversation {c.id}", "similarity": round(float(s), 4)}
+        for c, s in zip(convos, sims)
+    ]
+    candidates.sort(key=lambda r: r["similarity"], reverse=True)
+    cluster.representatives = candidates[:REPRESENTATIVES]
+
+    counts = Counter(cluster.keywords)
+    for convo in convos:
+        counts.update(_terms(convo))
+    cluster.keywords = dict(counts.most_common(MAX_KEYWORDS))
+    cluster.label = ", ".join(term for term, _ in counts.most_common(3))
+
+
+def _seed_topics(convos, X):
+    """Until k topics exist, each new conversation seeds its own topic. Returns the rest."""
+    with transaction.atomic():
+        seeded = len(TopicCluster.objects.select_for_update().values_list("id", flat=True))
+        count = 0
+        while seeded + count < num_topics() and count < len(convos):
+            cluster = TopicCluster(centroid=X[count].tolist())
+            _absorb(cluster, [convos[count]], X[count:count + 1])
+            cluster.save()
+            Conversation.objects.filter(id=convos[count].id).update(topic=cluster)
+            count += 1
+    return convos[count:], X[count:]
+
+
+def assign_conversations(convos, X):
+    """Assign conversations to their nearest topics, updating those centroids in place."""
+    if not convos:
+        return
+    X = _unit(np.asarray(X, dtype=float))
+
+    clusters = list(TopicCluster.objects.order_by("id"))
+    if len(clusters) < num_topics():
+        convos, X = _seed_topics(convos, X)
+        if not convos:
+            return
+        clusters = list(TopicCluster.objects.order_by("id"))
+
+    # Nearest centroids are picked from an unlocked read; only the chosen
+    # topic row is locked while it absorbs its members.
+    C = _unit(np.array([c.centroid for c in clusters], dtype=float))
+    labels = np.argmax(X @ C.T, axis=1)
+    for j in np.unique(labels):
+        members = np.flatnonzero(labels == j)
+        with transaction.atomic():
+            cluster = TopicCluster.objects.select_for_update().filter(id=clusters[j].id).first()
+            if cluster is None:
+                continue  # removed by a concurrent rebuild; cluster_topics assigns these later
+            _absorb(cluster, [convos[i] for i in members], X[members])
+            cluster.save()
+            Conversation.objects.filter(id__in=[convos[i].id for i in members]).update(topic=cluster)
+
+
+def assign_conversation(convo):
+    """Incrementally place a just-ended conversation into a topic."""
+    vector = conversation_vector(convo)
+    if vector is not None:
+        assign_conversations([convo], vector[None, :])
+
+
+def _kmeans_plus_plus(X, k, rng):
+    centroids = [X[rng.integers(len(X))]]
+    for _ in range(1, k):
+        dist = 1.0 - np.max(X @ np.array(centroids).T, axis=1)
+        dist = np.clip(dist, 0, None) ** 2
+        total = dist.sum()
+        idx = rng.choice(len(X), p=dist / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[idx])
+    return np.array(centroids)
+
+
+def minibatch_kmeans(X, k, batch_size=256, iterations=50, seed=0):
+    """Spherical mini-batch k-means; returns (centroids, labels)."""
+    rng = np.random.default_rng(seed)
+    C = _kmeans_plus_plus(X, k, rng)
+    counts = np.zeros(k)
+
+    for _ in range(iterations):
+        batch = X[rng.choice(len(X), size=min(batch_size, len(X)), replace=False)]
+        labels = np.argmax(batch @ C.T, axis=1)
+        sums = np.zeros_like(C)
+        np.add.at(sums, labels, batch)
+        sizes = np.bincount(labels, minlength=k)
+        counts += sizes
+        hit = sizes > 0
+        eta = sizes[hit] / counts[hit]
+        C[hit] = _unit((1 - eta)[:, None] * C[hit] + eta[:, None] * (sums[hit] / sizes[hit][:, None]))
+
+    return C, np.argmax(X @ C.T, axis=1)
+
+
+def rebuild_topics(k=None, batch_size=256, iterations=50):
+    """Re-fit every topic from all clusterable conversations."""
+    vectors = [
+        (c, conversation_vector(c))
+        for c in clusterable().only("id", "title", "ai_summary", "metadata", "summary_embedding")
+    ]
+    vectors = [(c, v) for c, v in vectors if v is not None]
+    if not vectors:
+        return 0
+
+    convos = [c for c, _ in vectors]
+    X = np.array([v for _, v in vectors])
+    k = min(k or num_topics(), len(convos))
+    C, labels = minibatch_kmeans(X, k, batch_size=batch_size, iterations=iterations)
+
+    with transaction.atomic():
+        TopicCluster.objects.all().delete()
+        for j in range(k):
+            members = np.flatnonzero(labels == j)
+            if not len(members):
+                continue
+            cluster = TopicCluster(centroid=C[j].tolist())
+            _absorb(cluster, [convos[i] for i in members], X[members])
+            cluster.centroid = C[j].tolist()
+            cluster.save()
+            Conversation.objects.filter(id__in=[convos[i].id for i in members]).update(topic=cluster)
+    return k
+
+
+def top_topics(limit=10):
+    """Precomputed topics, largest first."""
+    return [
+        {
+            "id": t.id,
+            "label": t.label or f"Topic {t.id}",
+            "size": t.size,
+            "keywords": sorted(t.keywords, key=t.keywords.get, reverse=True)[:5],
+            "representatives": t.representatives,
+        }
+        for t in TopicCluster.objects.order_by("-size")[:limit]
+    ]
@@ -11,6 +11,7 @@ urlpatterns = [
     path('status/', views.system_status),
     path('conversations/<int:conv_id>/end/', views.end_conversation),
     path('search/', views.search_conversations),   
+    path('topics/', views.topic_insights),
     path('<int:conv_id>/messages/', views.get_messages),   
    
    ]
@@ -0,0 +1,82 @@
+"""
+Incremental token and cost accounting.
+
+Usage from each LLM call is added to the conversation's running totals and
+to the row for the current day with F() expressions, so dashboards read
+stored aggregates instead of summing messages.
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Conversation, DailyUsage
+from . import live
+
+
+def cost_of(usage):
+    """Price a usage dict with AI_PRICING (USD per 1K tokens); unknown models are free."""
+    price = getattr(settings, "AI_PRICING", {}).get(usage.get("model"), {})
+    prompt = Decimal(str(price.get("prompt", 0))) * usage["prompt_tokens"] / 1000
+    completion = Decimal(str(price.get("completion", 0))) * usage["completion_tokens"] / 1000
+    return (prompt + completion).quantize(Decimal("0.000001"))
+
+
+def record_usage(conversation_id, usage):
+    """Add one call's usage to the conversation and daily aggregates."""
+    if not usage:
+        return
+
+    prompt_tokens = usage["prompt_tokens"]
+    completion_tokens = usage["completion_tokens"]
+    cost = cost_of(usage)
+
+    with transaction.atomic():
+        Conversation.objects.filter(id=conversation_id).update(
+            prompt_tokens=F("prompt_tokens") + prompt_tokens,
+            completion_tokens=F("completion_tokens") + completion_tokens,
+            total_tokens=F("total_tokens") + prompt_tokens + completion_tokens,
+            cost=F("cost") + cost,
+        )
+        day, _ = DailyUsage.objects.get_or_create(day=timezone.localdate())
+        DailyUsage.objects.filter(id=day.id).update(
+            requests=F("requests") + 1,
+            prompt_tokens=F("prompt_tokens") + prompt_tokens,
+            completion_tokens=F("completion_tokens") + completion_tokens,
+            cost=F("cost") + cost,
+        )
+
+    live.publish_stats(
+        tokens=prompt_tokens + completion_tokens,
+        cost=float(cost),
+        conversation={"id": conversation_id, "tokens": prompt_tokens + completion_tokens},
+    )
+
+
+def usage_overview(days=14, heaviest=5):
+    """Totals, recent daily rows and the most token-hungry conversations."""
+    daily = list(DailyUsage.objects.order_by("-day")[:days])
+    top = Conversation.objects.filter(total_tokens__gt=0).order_by("-total_tokens")[:heaviest]
+    return {
+        "daily": [
+            {
+                "day": d.day.isoformat(),
+                "requests": d.requests,
+                "prompt_tokens": d.prompt_tokens,
+                "completion_tokens": d.completion_tokens,
+                "cost": float(d.cost),
+            }
+            for d in daily
+        ],
+        "heaviest_conversations": [
+            {
+                "id": c.id,
+                "title": c.title or f"Conversation {c.id}",
+                "prompt_tokens": c.prompt_tokens,
+                "completion_tokens": c.completion_tokens,
+                "total_tokens": c.total_tokens,
+                "cost": float(c.cost),
+            }
+            for c in top
+        ],
+    }
@@ -5,34 +5,53 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Avg, F, ExpressionWrapper, DurationField
 from django.conf import settings
 from .models import Conversation, Message
-from .serializers import ConversationSerializer, MessageSerializer
-from .ai_service import AIService
+from .serializers import ConversationSerializer, ConversationMetaSerializer, MessageSerializer
+from .ai_service import get_ai_service
+from .admission import scheduler, AdmissionRejected
+from . import history
+from .archive import ensure_hot, ArchiveUnavailable
+from . import topics
+from .usage import record_usage, usage_overview
+from . import live
 
-ai = AIService()
+ai = get_ai_service()
 
 # ----------------------------------------------------------------------
 # CONVERSATION MANAGEMENT
 # ----------------------------------------------------------------------
 
+def _owner_key(request):
+    """Identify who owns a conversation: user, client id header, or session."""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+
+    client_id = request.headers.get("X-Client-Id", "").strip()
+    if client_id:
+        return f"client:{client_id[:64]}"
+
+    if not request.session.session_key:
+        request.session.save()
+    return f"session:{request.session.session_key}"
+
+
 @api_view(['POST'])
 def create_conversation(request):
-    """Create a new conversation and close any active ones."""
+    """Create a new conversation and close the owner's active one."""
     title = request.data.get('title', 'New Conversation')
 
-    # Mark existing active convos as ended
-    Conversation.objects.filter(status='active').update(
-        status='ended', ended_at=timezone.now()
-    )
-
-    convo = Conversation.objects.create(
-        title=title,
-        status='active',
+    convo, ended_ids = Conversation.objects.start_for_owner(
+        _owner_key(request),
+        title,
         metadata={
             "ai_mode": getattr(settings, "AI_MODE", "unknown"),
             "started_at": timezone.now().isoformat(),
         }
     )
 
+    for ended_id in ended_ids:
+        live.publish_status(ended_id, "ended", reason="replaced")
+    live.publish_stats(total=1, active=1 - len(ended_ids), ended=len(ended_ids))
+
     return Response({
         "id": convo.id,
         "title": convo.title,
@@ -50,28 +69,57 @@ def send_message(request, conv_id):
     if not content:
         return Response({"error": "Message cannot be empty."}, status=400)
 
+    try:
+        ensure_hot(convo)
+    except ArchiveUnavailable as e:
+        return Response({"error": str(e)}, status=503)
+
     # Save user message
     user_msg = Message.objects.create(conversation=convo, sender='user', content=content)
 
     try:
-        ai_response = ai.chat_with_context(convo, content)
-        ai_msg = Message.objects.create(conversation=convo, sender='ai', content=ai_response)
-
-        convo.status = "active"
-        convo.save(update_fields=["status"])
+        reply = ai.chat_with_context(convo, content)
+        usage = reply["usage"] or {}
+        ai_msg = Message.objects.create(
+            conversation=convo,
+            sender='ai',
+            content=reply["content"],
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+        record_usage(convo.id, reply["usage"])
+
+        if convo.status != "active":
+            previous = convo.status
+            ended_ids = Conversation.objects.activate(convo)
+            for ended_id in ended_ids:
+                live.publish_status(ended_id, "ended", reason="replaced")
+            live.publish_status(convo.id, "active")
+            live.publish_stats(
+                active=1 - len(ended_ids),
+                ended=len(ended_ids) - (previous == "ended"),
+            )
 
         return Response({
             "user": MessageSerializer(user_msg).data,
             "ai": MessageSerializer(ai_msg).data,
             "conversation_id": convo.id,
         })
+    except AdmissionRejected as e:
+        # Shed before any provider saw it: drop the turn so the client can retry.
+        live.publish(live.conversation_topic(convo.id), "message.deleted", {"id": user_msg.id})
+        user_msg.delete()
+        return Response({"error": str(e)}, status=429)
     except Exception as e:
+        previous = convo.status
         convo.status = "error"
         convo.metadata.update({
             "error": str(e),
             "failed_at": timezone.now().isoformat()
         })
         convo.save(update_fields=["status", "metadata"])
+        live.publish_status(convo.id, "error", error=str(e))
+        live.publish_stats(active=-(previous == "active"), ended=-(previous == "ended"))
         return Response({"error": str(e)}, status=500)
 
 
@@ -81,6 +129,7 @@ def end_conversation(request, conv_id):
     convo = get_object_or_404(Conversation, id=conv_id)
 
     if convo.status != 'ended':
+        previous = convo.status
         convo.status = 'ended'
         convo.ended_at = timezone.now()
         convo.metadata.update({
@@ -93,11 +142,33 @@ def end_conversation(request, conv_id):
             convo.ai_summary = summary_data.get("summary", "")
             convo.metadata["sentiment"] = summary_data.get("sentiment", "neutral")
             convo.metadata["keywords"] = summary_data.get("keywords", [])
+            record_usage(convo.id, summary_data.get("usage"))
+        except AdmissionRejected as e:
+            return Response({"error": str(e)}, status=429)
         except Exception as e:
             convo.ai_summary = "Summary unavailable due to AI error."
             convo.metadata["summary_error"] = str(e)
 
-        convo.save(update_fields=["status", "ended_at", "ai_summary", "metadata"])
+        if convo.ai_summary and "summary_error" not in convo.metadata:
+            # None when providers were unavailable; cluster_topics backfills it.
+            convo.summary_embedding = ai.embed_for_storage([convo.ai_summary])[0]
+
+        convo.save(update_fields=["status", "ended_at", "ai_summary", "metadata", "summary_embedding"])
+
+        try:
+            topics.assign_conversation(convo)
+        except Exception as e:
+            print(f" Topic assignment failed: {e}")
+
+        live.publish_status(
+            convo.id, "ended",
+            reason="user_ended",
+            ended_at=convo.ended_at,
+            summary=convo.ai_summary,
+            sentiment=convo.metadata.get("sentiment", "neutral"),
+            keywords=convo.metadata.get("keywords", []),
+        )
+        live.publish_stats(active=-(previous == "active"), ended=1)
 
     return Response({
         "status": convo.status,
@@ -116,14 +187,41 @@ def get_conversations(request):
     return Response(serializer.data)
 
 
+def _parse_after(request):
+    """Read the optional ``?after=<message_id>`` delta cursor."""
+    after = request.query_params.get("after")
+    if after is None:
+        return None
+    try:
+        return int(after)
+    except ValueError:
+        return False
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
 @api_view(['GET'])
 def get_conversation(request, conv_id):
     """Get all messages of a specific conversation (for chat reload)."""
-    convo = get_object_or_404(Conversation, id=conv_id)
-    convo_data = ConversationSerializer(convo).data
-    messages = Message.objects.filter(conversation=convo).order_by('created_at')
-    convo_data["messages"] = MessageSerializer(messages, many=True).data
-    return Response(convo_data)
+    after = _parse_after(request)
+    if after is False:
+        return Response({"error": "'after' must be a message id."}, status=400)
+
+    try:
+        convo = ensure_hot(get_object_or_404(Conversation, id=conv_id))
+    except ArchiveUnavailable as e:
+        return Response({"error": str(e)}, status=503)
+    convo_data = ConversationMetaSerializer(convo).data
+    cached = history.get_history(convo.id)
+    etag = history.conversation_etag(convo_data, cached)
+    if _not_modified(request, etag):
+        return Response(status=304, headers={"ETag": etag})
+
+    convo_data["messages"] = cached["messages"] if after is None else history.messages_after(cached, after)
+    return Response(convo_data, headers={"ETag": etag})
 
 
 @api_view(['GET'])
@@ -148,7 +246,8 @@ def dashboard_stats(request):
         "active": active,
         "ended": ended,
         "avg_duration_mins": round(avg_duration.total_seconds() / 60, 2) if avg_duration else 0,
-        "recent": serializer.data
+        "recent": serializer.data,
+        "usage": usage_overview(),
     })
 
 
@@ -165,10 +264,22 @@ def system_status(request):
         "openai_enabled": bool(getattr(settings, "OPENAI_API_KEY", "")),
         "lm_studio_url": getattr(settings, "LM_STUDIO_URL", "not configured"),
         "debug": settings.DEBUG,
+        "admission": scheduler.metrics(),
     }
     return Response(data)
 
 
+@api_view(["GET"])
+def topic_insights(request):
+    """Precomputed conversation topics with sizes and representative chats."""
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+    except ValueError:
+        return Response({"error": "'limit' must be an integer."}, status=400)
+
+    return Response({"topics": topics.top_topics(limit)})
+
+
 @api_view(["POST"])
 def search_conversations(request):
     """Semantic search endpoint."""
@@ -179,13 +290,24 @@ def search_conversations(request):
     try:
         results = ai.semantic_search(query)
         return Response({"results": results})
+    except AdmissionRejected as e:
+        return Response({"error": str(e)}, status=429)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
 @api_view(['GET'])
 def get_messages(request, conv_id):
-    convo = get_object_or_404(Conversation, id=conv_id)
-    messages = Message.objects.filter(conversation=convo).order_by('created_at')
-    serializer = MessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    after = _parse_after(request)
+    if after is False:
+        return Response({"error": "'after' must be a message id."}, status=400)
 
+    try:
+        convo = ensure_hot(get_object_or_404(Conversation, id=conv_id))
+    except ArchiveUnavailable as e:
+        return Response({"error": str(e)}, status=503)
+    cached = history.get_history(convo.id)
+    if _not_modified(request, cached["etag"]):
+        return Response(status=304, headers={"ETag": cached["etag"]})
+
+    messages = cached["messages"] if after is None else history.messages_after(cached, after)
+    return Response(messages, headers={"ETag": cached["etag"]})
@@ -67,6 +67,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "chat_api.wsgi.application"
+ASGI_APPLICATION = "chat_api.asgi.application"
 
 # --- Database ---
 DATABASES = {
@@ -80,6 +81,29 @@ DATABASES = {
     }
 }
 
+# --- Cache ---
+# In-memory locally; point at a shared backend (e.g. Redis) when running several workers
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "chat-portal"),
+    }
+}
+HISTORY_CACHE_TIMEOUT = int(os.getenv("HISTORY_CACHE_TIMEOUT", "3600"))
+
+# --- Message Archival (manage.py archive_conversations) ---
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "365"))
+MESSAGE_ARCHIVE_DIR = Path(os.getenv("MESSAGE_ARCHIVE_DIR", BASE_DIR / "archive"))
+
+# --- Live Updates (WebSocket at LIVE_WEBSOCKET_PATH, served by the ASGI app) ---
+# Swap for a broker shared between workers when running more than one process
+LIVE_BROKER = os.getenv("LIVE_BROKER", "chat.live.InMemoryBroker")
+LIVE_WEBSOCKET_PATH = "/ws/chat/"
+LIVE_QUEUE_SIZE = 100
+
+# --- Topic Clustering (manage.py cluster_topics) ---
+TOPIC_CLUSTERS = int(os.getenv("TOPIC_CLUSTERS", "8"))
+
 # --- Password Validators ---
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -114,11 +138,37 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["DELETE", "GET", "OPTIONS", "PATCH", "POST", "PUT"]
 CORS_ALLOW_HEADERS = ["*"]
+CORS_EXPOSE_HEADERS = ["ETag"]
 # --- AI Configuration (OpenAI + LM Studio fallback) ---
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 LM_STUDIO_URL = os.getenv("LM_STUDIO_URL", "http://localhost:1234/v1/chat/completions")
 AI_MODE = "openai" if OPENAI_API_KEY else "local"
 
+# Embedding requests arriving within this window are sent as one batch
+EMBEDDING_BATCH_WINDOW_MS = int(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "2048"))
+# Longest a caller waits for its embedding before giving up (seconds)
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "120"))
+
+# Provider rate limits (requests / tokens per minute) enforced by chat.admission
+AI_RATE_LIMITS = {
+    "openai": {
+        "rpm": int(os.getenv("OPENAI_RPM", "3500")),
+        "tpm": int(os.getenv("OPENAI_TPM", "90000")),
+    },
+    "lm_studio": {
+        "rpm": int(os.getenv("LM_STUDIO_RPM", "600")),
+        "tpm": int(os.getenv("LM_STUDIO_TPM", "1000000")),
+    },
+}
+# Share of each bucket that summaries and embeddings may not consume
+AI_INTERACTIVE_RESERVE = float(os.getenv("AI_INTERACTIVE_RESERVE", "0.2"))
+
+# USD per 1K tokens used for cost accounting; models not listed (e.g. LM Studio) cost nothing
+AI_PRICING = {
+    "gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015},
+}
+
 if OPENAI_API_KEY:
     print(" Using OpenAI API Key from .env")
 else:
@@ -1,6 +1,5 @@
 import React, { useState, useEffect, useRef } from "react";
-import { sendMessage, endConversation } from "./api";
-import axios from "axios";
+import { sendMessage, endConversation, subscribeLive, getConversationMessages } from "./api";
 
 interface ChatProps {
   convId: number;
@@ -8,6 +7,7 @@ interface ChatProps {
 }
 
 interface Message {
+  id?: number;
   sender: string;
   content: string;
 }
@@ -18,19 +18,51 @@ const Chat: React.FC<ChatProps> = ({ convId, onEnd }) => {
   const [ended, setEnded] = useState(false);
   const [loading, setLoading] = useState(true);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const messagesRef = useRef<Message[]>([]);
+  messagesRef.current = messages;
 
+  // Add messages not shown yet, keeping server (id) order
+  const mergeMessages = (incoming: Message[]) =>
+    setMessages((prev) =>
+      [...prev, ...incoming.filter((m) => !prev.some((p) => p.id === m.id))].sort(
+        (a, b) => (a.id ?? 0) - (b.id ?? 0)
+      )
+    );
+
+  // Subscribe before the initial load so nothing published in between is lost;
+  // after a reconnect, fetch only the messages newer than the last one shown.
   useEffect(() => {
-    const fetchMessages = async () => {
-      try {
-        const res = await axios.get(`/api/chat/${convId}/messages/`);
-        setMessages(res.data);
-      } catch (err) {
-        console.error("Error loading conversation:", err);
-      } finally {
-        setLoading(false);
+    if (!convId) return;
+    setMessages([]);
+    setEnded(false);
+    setLoading(true);
+
+    const unsubscribe = subscribeLive(
+      [`conversation:${convId}`],
+      (event) => {
+        if (event.type === "message.created") {
+          mergeMessages([event.data]);
+        } else if (event.type === "message.deleted") {
+          setMessages((prev) => prev.filter((m) => m.id !== event.data.id));
+        } else if (event.type === "conversation.status") {
+          if (event.data.status === "ended") setEnded(true);
+          else if (event.data.status === "active") setEnded(false);
+        }
+      },
+      () => {
+        const lastId = Math.max(0, ...messagesRef.current.map((m) => m.id ?? 0));
+        getConversationMessages(convId, lastId)
+          .then(mergeMessages)
+          .catch((err) => console.error("Error catching up on messages:", err));
       }
-    };
-    if (convId) fetchMessages();
+    );
+
+    getConversationMessages(convId)
+      .then(mergeMessages)
+      .catch((err) => console.error("Error loading conversation:", err))
+      .finally(() => setLoading(false));
+
+    return unsubscribe;
   }, [convId]);
 
   useEffect(() => {
@@ -41,11 +73,8 @@ const Chat: React.FC<ChatProps> = ({ convId, onEnd }) => {
     if (!input.trim() || ended) return;
     try {
       const response = await sendMessage(convId, input);
-      setMessages((prev) => [
-        ...prev,
-        { sender: "user", content: input },
-        { sender: "ai", content: response.ai.content },
-      ]);
+      // The live socket may already have delivered these
+      mergeMessages([response.user, response.ai]);
       setInput("");
     } catch (err) {
       console.error("Error sending message:", err);
@@ -81,7 +110,7 @@ const Chat: React.FC<ChatProps> = ({ convId, onEnd }) => {
       <div className="chat-box">
         {messages.map((msg, i) => (
           <div
-            key={i}
+            key={msg.id ?? i}
             className={`chat-row ${
               msg.sender === "user" ? "chat-row-user" : "chat-row-ai"
             }`}
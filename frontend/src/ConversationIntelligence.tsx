@@ -1,10 +1,17 @@
-import React, { useState } from "react";
-import { searchConversations } from "./api";
+import React, { useEffect, useState } from "react";
+import { searchConversations, getTopics } from "./api";
 
 const ConversationIntelligence: React.FC = () => {
   const [query, setQuery] = useState("");
   const [results, setResults] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
+  const [topics, setTopics] = useState<any[]>([]);
+
+  useEffect(() => {
+    getTopics()
+      .then((data) => setTopics(data.topics || []))
+      .catch((err) => console.error("Error loading topics:", err));
+  }, []);
 
   const handleSearch = async () => {
     if (!query.trim()) return;
@@ -20,6 +27,28 @@ const ConversationIntelligence: React.FC = () => {
         Conversation Intelligence
       </h2>
 
+      {topics.length > 0 && (
+        <div className="mb-6">
+          <h3 className="text-lg font-semibold text-gray-200 mb-2">Top Topics</h3>
+          <div className="space-y-2">
+            {topics.map((t) => (
+              <div
+                key={t.id}
+                className="border border-gray-600 rounded-md p-3 bg-black/20"
+              >
+                <div className="flex justify-between text-gray-100">
+                  <b>{t.label}</b>
+                  <span className="text-sm text-gray-400">{t.size} chats</span>
+                </div>
+                <p className="text-sm text-gray-400">
+                  e.g. {t.representatives.map((r: any) => r.title).join(", ")}
+                </p>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       <div className="flex items-center space-x-3 mb-6">
         <input
           type="text"
@@ -1,11 +1,14 @@
 import React, { useEffect, useState } from "react";
-import { getDashboard } from "./api";
+import { getDashboard, subscribeLive } from "./api";
 
 interface Stats {
   total_conversations: number;
   active_conversations: number;
   avg_response_time: string;
   local_llm: boolean;
+  recent_tokens: number;
+  recent_cost: number;
+  heaviest: { id: number; title: string; total_tokens: number; cost: number }[];
 }
 
 const Dashboard: React.FC = () => {
@@ -13,9 +16,32 @@ const Dashboard: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    getDashboard()
-      .then(setStats)
-      .catch((err) => setError(err.message));
+    const load = () =>
+      getDashboard()
+        .then(setStats)
+        .catch((err) => setError(err.message));
+
+    // Apply counter deltas pushed by the server instead of re-fetching;
+    // deltas missed while the socket was down are covered by a fresh load.
+    const unsubscribe = subscribeLive(
+      ["dashboard"],
+      (event) => {
+        if (event.type !== "stats.delta") return;
+        const d = event.data;
+        setStats((prev) =>
+          prev && {
+            ...prev,
+            total_conversations: prev.total_conversations + (d.total || 0),
+            active_conversations: prev.active_conversations + (d.active || 0),
+            recent_tokens: prev.recent_tokens + (d.tokens || 0),
+            recent_cost: prev.recent_cost + (d.cost || 0),
+          }
+        );
+      },
+      load
+    );
+    load();
+    return unsubscribe;
   }, []);
 
   if (error)
@@ -43,13 +69,33 @@ const Dashboard: React.FC = () => {
           <span>Avg Response Time:</span>
           <b className="text-blue-300">{stats.avg_response_time}</b>
         </div>
-        <div className="flex justify-between">
+        <div className="flex justify-between border-b border-gray-700 pb-2">
           <span>Using Local LLM:</span>
           <b className={stats.local_llm ? "text-green-400" : "text-red-400"}>
             {stats.local_llm ? "Yes" : "No"}
           </b>
         </div>
+        <div className="flex justify-between border-b border-gray-700 pb-2">
+          <span>Tokens (14 days):</span>
+          <b className="text-blue-300">{stats.recent_tokens.toLocaleString()}</b>
+        </div>
+        <div className="flex justify-between">
+          <span>Cost (14 days):</span>
+          <b className="text-blue-300">${stats.recent_cost.toFixed(4)}</b>
+        </div>
       </div>
+
+      {stats.heaviest.length > 0 && (
+        <div className="mt-6 text-gray-200">
+          <h3 className="text-lg font-semibold text-blue-400 mb-2">Heaviest Conversations</h3>
+          {stats.heaviest.map((c) => (
+            <div key={c.id} className="flex justify-between text-sm border-b border-gray-700 py-1">
+              <span>{c.title}</span>
+              <span className="text-gray-400">{c.total_tokens.toLocaleString()} tokens</span>
+            </div>
+          ))}
+        </div>
+      )}
     </div>
   );
 };
@@ -19,11 +19,21 @@ export interface Conversation {
 const BASE_URL = import.meta.env.VITE_BACKEND_URL || "http://localhost:8000";
 const BASE = `${BASE_URL}/api/chat`;
 
+// Stable per-browser id so the backend only ends this client's active chat
+function getClientId(): string {
+  let id = localStorage.getItem("chat_client_id");
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem("chat_client_id", id);
+  }
+  return id;
+}
+
 // Create new conversation
 export async function createConversation(title = "New Conversation") {
   const res = await fetch(`${BASE}/create/`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", "X-Client-Id": getClientId() },
     body: JSON.stringify({ title }),
   });
   if (!res.ok) throw new Error(`Failed to create conversation: ${res.statusText}`);
@@ -48,11 +58,24 @@ export async function getConversations(): Promise<Conversation[]> {
   return res.json();
 }
 
-// Get a specific conversation
-export async function getConversationMessages(convId: number) {
-  const res = await fetch(`${BASE}/${convId}/messages/`);
+// Last response per messages URL, revalidated with If-None-Match
+const messageCache = new Map<string, { etag: string; data: Message[] }>();
+
+// Get a conversation's messages (pass `after` to fetch only newer messages)
+export async function getConversationMessages(convId: number, after?: number): Promise<Message[]> {
+  const query = after !== undefined ? `?after=${after}` : "";
+  const url = `${BASE}/${convId}/messages/${query}`;
+  const cached = messageCache.get(url);
+  const res = await fetch(url, {
+    headers: cached ? { "If-None-Match": cached.etag } : {},
+  });
+  if (res.status === 304 && cached) return cached.data;
   if (!res.ok) throw new Error("Failed to fetch messages");
-  return res.json();
+
+  const data: Message[] = await res.json();
+  const etag = res.headers.get("ETag");
+  if (etag) messageCache.set(url, { etag, data });
+  return data;
 }
 
 // End a conversation
@@ -86,6 +109,12 @@ export async function getDashboard() {
     active_conversations: data.active,
     avg_response_time: `${data.avg_duration_mins?.toFixed(2)} mins`,
     local_llm: data.using_local_llm || false,
+    recent_tokens: (data.usage?.daily || []).reduce(
+      (sum: number, d: any) => sum + d.prompt_tokens + d.completion_tokens,
+      0
+    ),
+    recent_cost: (data.usage?.daily || []).reduce((sum: number, d: any) => sum + d.cost, 0),
+    heaviest: data.usage?.heaviest_conversations || [],
   };
 }
 // Search conversations
@@ -99,3 +128,48 @@ export async function searchConversations(query: string) {
   return res.json();
 }
 
+// Get precomputed conversation topics
+export async function getTopics(limit = 10) {
+  const res = await fetch(`${BASE}/topics/?limit=${limit}`);
+  if (!res.ok) throw new Error("Failed to fetch topics");
+  return res.json();
+}
+
+// Subscribe to live updates ("dashboard", "conversation:<id>"). Dropped sockets
+// reconnect with backoff and then call `onReconnect` so the caller can fetch
+// whatever it missed. Returns a close function.
+export function subscribeLive(
+  topics: string[],
+  onEvent: (event: any) => void,
+  onReconnect?: () => void
+) {
+  const wsBase = BASE_URL.replace(/^http/, "ws");
+  const query = topics.map((t) => `topic=${encodeURIComponent(t)}`).join("&");
+  let socket: WebSocket;
+  let retries = 0;
+  let timer: ReturnType<typeof setTimeout> | undefined;
+  let closed = false;
+
+  const connect = () => {
+    socket = new WebSocket(`${wsBase}/ws/chat/?${query}`);
+    socket.onopen = () => {
+      if (retries > 0) onReconnect?.();
+      retries = 0;
+    };
+    socket.onmessage = (msg) => onEvent(JSON.parse(msg.data));
+    socket.onerror = (err) => console.error("Live updates error:", err);
+    socket.onclose = () => {
+      if (closed) return;
+      const delay = Math.min(30000, 1000 * 2 ** retries);
+      retries += 1;
+      timer = setTimeout(connect, delay);
+    };
+  };
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    socket.close();
+  };
+}
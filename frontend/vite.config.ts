@@ -12,6 +12,12 @@ export default defineConfig({
         changeOrigin: true,
         secure: false,
       },
+      "/ws": {
+        target: process.env.VITE_BACKEND_URL || "http://localhost:8000",
+        ws: true,
+        changeOrigin: true,
+        secure: false,
+      },
     },
   },
 });